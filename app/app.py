@@ -1,6 +1,4 @@
-from . import events
-from . import database
-import os
+from . import ingest
 from . import files
 import time
 import threading
@@ -16,25 +14,7 @@ logger.info(f"Configuration loaded: in_event_ids={in_event_ids}, out_event_ids={
 
 def process_events():
     logger.info("Starting process_events")
-
-    # Ensure archive folder exists
-    files.ensure_archive_folder(archive_folder)
-
-    # Initialize database
-    logger.info("Initializing database")
-    database.init_db()
-
-    # Read and process events
-    logger.info(f"Reading events from {events_file}")
-    event_list = events.read_events(events_file, event_ids)
-    logger.info(f"Loaded {len(event_list)} events")
-    for event in event_list:
-        database.insert_event(event)
-    logger.info("Inserted events into database")
-
-    # Archive the processed events file
-    logger.info(f"Archiving {events_file} to {archive_folder}")
-    files.archive_file(events_file, archive_folder)
+    ingest.run_cycle(events_file, archive_folder, event_ids, incremental=files.get_setting("incremental", False))
     logger.info("Process events completed")
 
 def process_loop():
@@ -46,5 +26,5 @@ def process_loop():
 if __name__ == '__main__':
     # Start the processing loop in a background thread
     threading.Thread(target=process_loop, daemon=True).start()
-    # Run the Flask web server
-    app.run(debug=True)
\ No newline at end of file
+    # Run the Flask development server; use app.serve in production
+    app.run(debug=files.get_setting("web_debug", False))
\ No newline at end of file
@@ -0,0 +1,59 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from . import database
+from . import events
+from loguru import logger
+
+
+def _parse_file(path, event_ids):
+    """Worker: parse one archived file into a list of events"""
+    return events.read_events(path, event_ids)
+
+def backfill(paths, event_ids, workers=None, progress=None):
+    """Ingest many event files: parse them in a process pool, write from this process.
+
+    Parsing is CPU-bound and runs in up to workers processes (default: one
+    per CPU). Parsed files come back in order and are inserted one
+    transaction per file by the single writer here, so SQLite never sees
+    concurrent writers and an interrupted backfill keeps every file it
+    finished. At most 2 * workers parsed files wait in memory at a time.
+    progress, if given, is called as progress(done, total, path, inserted, rows_per_second).
+    Returns (files ingested, events inserted).
+    """
+    database.init_db()
+    workers = workers or os.cpu_count() or 1
+    total_files = len(paths)
+    logger.info(f"Backfilling {total_files} files with {workers} parser processes")
+    started = time.perf_counter()
+    parsed_rows = 0
+    inserted = 0
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        queue = iter(paths)
+        for path in queue:
+            pending.append((path, pool.submit(_parse_file, path, event_ids)))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            path, future = pending.pop(0)
+            next_path = next(queue, None)
+            if next_path is not None:
+                pending.append((next_path, pool.submit(_parse_file, next_path, event_ids)))
+            try:
+                file_events = future.result()
+            except Exception as e:
+                # Empty or unreadable files are skipped, not fatal to the whole backfill
+                logger.warning(f"Skipping {path}: {e}")
+                file_events = []
+            file_inserted = database.insert_events(file_events) if file_events else 0
+            parsed_rows += len(file_events)
+            inserted += file_inserted
+            done += 1
+            rate = parsed_rows / max(time.perf_counter() - started, 1e-9)
+            logger.info(f"[{done}/{total_files}] {path}: {file_inserted} new of {len(file_events)} events ({rate:.0f} rows/s)")
+            if progress:
+                progress(done, total_files, path, file_inserted, rate)
+    logger.info(f"Backfill finished: {inserted} events inserted from {done} files")
+    return done, inserted
@@ -1,15 +1,95 @@
 import sqlite3 as sql
 import json
 import os
+import threading
+from contextlib import contextmanager
 from datetime import date, datetime
+from functools import partial
+from itertools import islice
 from loguru import logger
+from . import files
+from .cache import ReportCache
+
+# Connection tuning; WAL lets report readers run while the processor writes
+BUSY_TIMEOUT_MS = 10000
+CACHE_SIZE_KIB = 64 * 1024
+MMAP_SIZE = 256 * 1024 * 1024
+
+_local = threading.local()
+_db_path = None
+_generation = 0
+
+def configure(db_path=None):
+    """Point all connections at db_path (None: database_path from config.json).
+
+    Connections opened before the call are replaced on their next use.
+    """
+    global _db_path, _generation
+    _db_path = db_path
+    _generation += 1
+
+def get_db_path():
+    global _db_path
+    if _db_path is None:
+        try:
+            _db_path = files.get_setting("database_path", "events.db")
+        except FileNotFoundError:
+            _db_path = "events.db"
+    return _db_path
+
+def open_connection(check_same_thread=True):
+    """Open a new tuned connection to the configured database in autocommit mode"""
+    db_path = get_db_path()
+    logger.debug(f"Opening database connection to {db_path}")
+    conn = sql.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None,
+                       check_same_thread=check_same_thread)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    conn.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KIB}')
+    conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    return conn
+
+def get_connection():
+    """Return this thread's persistent connection, opening it on first use.
+
+    Connections are in autocommit mode; writes go through _transaction().
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.generation == _generation:
+        return conn
+    if conn is not None:
+        conn.close()
+    conn = open_connection()
+    _local.conn = conn
+    _local.generation = _generation
+    return conn
+
+def close_connection():
+    """Close this thread's connection, if any"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+@contextmanager
+def _transaction():
+    """Yield a cursor inside a write transaction that commits on success"""
+    cursor = get_connection().cursor()
+    # IMMEDIATE takes the write lock up front so the busy timeout applies here
+    # rather than failing later when a read transaction tries to upgrade
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        yield cursor
+    except BaseException:
+        cursor.execute('ROLLBACK')
+        raise
+    cursor.execute('COMMIT')
 
     
-def init_db():
-    logger.info("Initializing database")
-    db_path = 'events.db'
-    conn = sql.connect(db_path)
-    cursor = conn.cursor()
+def _create_base_tables(cursor):
+    """events and ingest_checkpoints tables"""
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS events (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -20,137 +100,725 @@ def init_db():
             id_point INTEGER
         )
     ''')
-    conn.commit()
-    conn.close()
-    logger.info("Database initialized")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+            path TEXT PRIMARY KEY,
+            inode INTEGER,
+            size INTEGER,
+            offset INTEGER,
+            encoding TEXT,
+            updated_at TEXT
+        )
+    ''')
+
+def _create_natural_key_index(cursor):
+    """unique index on the natural event key"""
+    # Later migrations need the full chain, so duplicates are folded here
+    # instead of stopping at this version
+    cursor.execute('''
+        DELETE FROM events WHERE id NOT IN (
+            SELECT MIN(id) FROM events GROUP BY date, time, name, surname, id_point
+        )
+    ''')
+    if cursor.rowcount:
+        logger.warning(f"Removed {cursor.rowcount} duplicate events before creating the unique index")
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_events_natural_key
+        ON events (date, time, name, surname, id_point)
+    ''')
+
+def _create_report_index(cursor):
+    """covering index for per-date report queries"""
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_events_date_person
+        ON events (date, name, surname, time, id_point)
+    ''')
+
+def _create_event_indexes(cursor, table='events'):
+    # Leading ts serves every date-range report; it also enforces the natural key
+    cursor.execute(f'''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_events_natural_key
+        ON {table} (ts, person_id, id_point)
+    ''')
+
+def _normalize_events(cursor):
+    """people table and integer event timestamps"""
+    cursor.execute('''
+        CREATE TABLE people (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            surname TEXT NOT NULL,
+            UNIQUE (name, surname)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE events_normalized (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            person_id INTEGER NOT NULL REFERENCES people (id),
+            ts INTEGER NOT NULL,
+            id_point INTEGER
+        )
+    ''')
+    # Rows that differ as text can share a normalized key ('9:05:00' and
+    # '09:05:00', NULL and '' names), so the unique index must exist before
+    # the copy for OR IGNORE to fold them; the old index holds its name
+    cursor.execute('DROP INDEX IF EXISTS idx_events_natural_key')
+    _create_event_indexes(cursor, 'events_normalized')
+    # Legacy rows whose date or time cannot be converted are kept here as they
+    # were rather than lost
+    cursor.execute('''
+        CREATE TABLE events_unparsed (
+            id INTEGER PRIMARY KEY,
+            time TEXT,
+            date TEXT,
+            name TEXT,
+            surname TEXT,
+            id_point INTEGER
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO people (name, surname)
+        SELECT DISTINCT COALESCE(name, ''), COALESCE(surname, '') FROM events ORDER BY 1, 2
+    ''')
+    person_ids = {(name, surname): person_id for person_id, name, surname in cursor.execute('SELECT id, name, surname FROM people')}
+
+    reader = cursor.connection.cursor()
+    reader.execute('SELECT id, date, time, name, surname, id_point FROM events ORDER BY id')
+    day_starts = {}
+    skipped = 0
+    while True:
+        rows = reader.fetchmany(50000)
+        if not rows:
+            break
+        batch = []
+        unparsed = []
+        for row in rows:
+            event_id, date_str, time_str, name, surname, id_point = row
+            if not isinstance(date_str, str) or not isinstance(time_str, str):
+                # NULL (or non-text) date or time
+                unparsed.append(row)
+                continue
+            try:
+                ts = _timestamp(date_str, time_str, day_starts)
+            except ValueError:
+                unparsed.append(row)
+                continue
+            batch.append((event_id, person_ids[(name or '', surname or '')], ts, id_point))
+        skipped += len(unparsed)
+        cursor.executemany('''
+            INSERT INTO events_unparsed (id, date, time, name, surname, id_point)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', unparsed)
+        # OR IGNORE keeps the oldest row of each natural key
+        cursor.executemany('''
+            INSERT OR IGNORE INTO events_normalized (id, person_id, ts, id_point)
+            VALUES (?, ?, ?, ?)
+        ''', batch)
+    if skipped:
+        logger.warning(f"Moved {skipped} events with unparseable date/time to events_unparsed during migration")
+
+    cursor.execute('DROP TABLE events')
+    cursor.execute('ALTER TABLE events_normalized RENAME TO events')
+
+def _fill_daily_attendance(cursor):
+    cursor.execute('''
+        INSERT INTO daily_attendance (day, person_id, id_point, first_ts, last_ts)
+        SELECT ts / 86400, person_id, id_point, MIN(ts), MAX(ts)
+        FROM events
+        GROUP BY ts / 86400, person_id, id_point
+    ''')
+
+def _create_daily_attendance(cursor):
+    """daily_attendance summary table"""
+    # One row per person, day and id_point with the first and last time that
+    # point was used. IN/OUT ids are configured at query time, so reports fold
+    # these rows into first IN / last OUT rather than storing minutes here.
+    cursor.execute('''
+        CREATE TABLE daily_attendance (
+            day INTEGER NOT NULL,
+            person_id INTEGER NOT NULL,
+            id_point INTEGER NOT NULL,
+            first_ts INTEGER NOT NULL,
+            last_ts INTEGER NOT NULL,
+            PRIMARY KEY (day, person_id, id_point)
+        ) WITHOUT ROWID
+    ''')
+    _fill_daily_attendance(cursor)
+
+def _create_day_versions(cursor):
+    """day_versions table for report cache invalidation"""
+    # Bumped for every day an ingest touches, so cached reports for a period
+    # stay valid exactly as long as the sum of its day versions is unchanged
+    cursor.execute('''
+        CREATE TABLE day_versions (
+            day INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    ''')
+
+def _create_archive_sequence(cursor):
+    """archive_sequence table for archive file numbering"""
+    cursor.execute('''
+        CREATE TABLE archive_sequence (
+            base_name TEXT PRIMARY KEY,
+            last INTEGER NOT NULL
+        )
+    ''')
+
+def _create_processed_files(cursor):
+    """processed_files journal of ingested files"""
+    cursor.execute('''
+        CREATE TABLE processed_files (
+            checksum TEXT PRIMARY KEY,
+            source TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            inserted INTEGER NOT NULL,
+            processed_at TEXT NOT NULL
+        )
+    ''')
+
+def _add_checkpoint_fingerprint(cursor):
+    """fingerprint column on ingest_checkpoints"""
+    cursor.execute('ALTER TABLE ingest_checkpoints ADD COLUMN fingerprint TEXT')
+
+# Applied in order; PRAGMA user_version records how many have run.
+# Append new migrations at the end and never reorder existing ones.
+MIGRATIONS = [
+    _create_base_tables,
+    _create_natural_key_index,
+    _create_report_index,
+    _normalize_events,
+    _create_daily_attendance,
+    _create_day_versions,
+    _create_archive_sequence,
+    _create_processed_files,
+    _add_checkpoint_fingerprint,
+]
+
+def _migrate():
+    version = get_connection().execute('PRAGMA user_version').fetchone()[0]
+    while version < len(MIGRATIONS):
+        with _transaction() as cursor:
+            # Re-read under the write lock: another process may have applied
+            # migrations since, and each one must run exactly once
+            version = cursor.execute('PRAGMA user_version').fetchone()[0]
+            if version >= len(MIGRATIONS):
+                break
+            migration = MIGRATIONS[version]
+            logger.info(f"Applying schema migration {version + 1}: {migration.__doc__}")
+            migration(cursor)
+            cursor.execute(f'PRAGMA user_version = {version + 1}')
+        version += 1
+    return version
+
+# Event times are stored as seconds since 1970-01-01 00:00 in local wall-clock
+# time (no timezone or DST shifts), so ts // 86400 is the day number and
+# ts % 86400 the second of that day.
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+def _day_start(date_str):
+    """Return the timestamp of 00:00:00 on an ISO date"""
+    return (date.fromisoformat(date_str).toordinal() - EPOCH_ORDINAL) * 86400
+
+def _timestamp(date_str, time_str, day_starts):
+    """Convert ISO date and HH:MM:SS strings to a timestamp, caching day starts"""
+    start = day_starts.get(date_str)
+    if start is None:
+        start = day_starts[date_str] = _day_start(date_str)
+    hours, minutes, seconds = time_str.split(':')
+    return start + int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+def _format_timestamp(ts):
+    """Return (time, date) strings for a timestamp"""
+    day, seconds = divmod(ts, 86400)
+    return (f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}",
+            date.fromordinal(day + EPOCH_ORDINAL).isoformat())
+
+def init_db():
+    logger.info("Initializing database")
+    version = _migrate()
+    logger.info(f"Database initialized (schema version {version})")
 
 def insert_event(event):
     logger.debug(f"Inserting event: {event}")
-    db_path = 'events.db'
-    conn = sql.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO events (time, date, name, surname, id_point)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (event.time, event.date, event.name, event.surname, event.id_point))
-    conn.commit()
-    conn.close()
+    # Attribute access also accepts EventProcessor objects, which do not unpack
+    insert_events([(event.time, event.date, event.name, event.surname, event.id_point)])
     logger.debug("Event inserted")
 
+def _resolve_people(cursor, people, person_ids):
+    """Add the ids of people (name, surname pairs) to person_ids, creating missing rows"""
+    missing = [person for person in people if person not in person_ids]
+    if not missing:
+        return
+    cursor.executemany('INSERT OR IGNORE INTO people (name, surname) VALUES (?, ?)', missing)
+    for person in missing:
+        cursor.execute('SELECT id FROM people WHERE name = ? AND surname = ?', person)
+        person_ids[person] = cursor.fetchone()[0]
+
+def _insert_batches(cursor, events, batch_size):
+    rows = iter(events)
+    person_ids = {}
+    day_starts = {}
+    total = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        _resolve_people(cursor, {(name, surname) for _, _, name, surname, _ in batch}, person_ids)
+        values = []
+        for time_str, date_str, name, surname, id_point in batch:
+            try:
+                ts = _timestamp(date_str, time_str, day_starts)
+            except ValueError:
+                logger.warning(f"Skipping event with invalid date/time: {date_str} {time_str}")
+                continue
+            values.append((person_ids[(name, surname)], ts, id_point))
+        last_id = cursor.execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()[0]
+        cursor.executemany('''
+            INSERT OR IGNORE INTO events (person_id, ts, id_point)
+            VALUES (?, ?, ?)
+        ''', values)
+        inserted = cursor.rowcount
+        total += inserted
+        logger.debug(f"Inserted {inserted} of {len(batch)} events in batch")
+        if inserted:
+            # Ids only grow (AUTOINCREMENT), so the rows past last_id are exactly
+            # the new ones; duplicates must not touch the summary or the cache
+            cursor.execute('SELECT person_id, ts, id_point FROM events WHERE id > ?', (last_id,))
+            _update_daily_attendance(cursor, cursor.fetchall())
+    return total
+
+def _update_daily_attendance(cursor, values):
+    """Fold (person_id, ts, id_point) rows into daily_attendance"""
+    summary = {}
+    for person_id, ts, id_point in values:
+        key = (ts // 86400, person_id, id_point)
+        span = summary.get(key)
+        if span is None:
+            summary[key] = (ts, ts)
+        else:
+            summary[key] = (min(span[0], ts), max(span[1], ts))
+    cursor.executemany('''
+        INSERT INTO daily_attendance (day, person_id, id_point, first_ts, last_ts)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (day, person_id, id_point) DO UPDATE SET
+            first_ts = MIN(first_ts, excluded.first_ts),
+            last_ts = MAX(last_ts, excluded.last_ts)
+    ''', [(*key, first_ts, last_ts) for key, (first_ts, last_ts) in summary.items()])
+    cursor.executemany('''
+        INSERT INTO day_versions (day, version) VALUES (?, 1)
+        ON CONFLICT (day) DO UPDATE SET version = version + 1
+    ''', [(day,) for day in {key[0] for key in summary}])
+
+def insert_events(events, batch_size=5000):
+    """Insert many events using one connection and a single transaction.
+
+    events are events.Event records or tuples in the same field order. Rows
+    are written with executemany in chunks of batch_size so memory stays
+    bounded for large files, but everything is committed once at the end.
+    Events already stored for the same person, timestamp and id_point are
+    skipped, so reprocessing a file is safe. Returns the number of newly
+    inserted rows.
+    """
+    logger.info(f"Bulk inserting events (batch_size={batch_size})")
+    with _transaction() as cursor:
+        total = _insert_batches(cursor, events, batch_size)
+    logger.info(f"Inserted {total} events")
+    return total
+
+def get_checkpoint(path):
+    """Return the stored (inode, size, offset, encoding, fingerprint) for path, or None"""
+    cursor = get_connection().cursor()
+    cursor.execute('SELECT inode, size, offset, encoding, fingerprint FROM ingest_checkpoints WHERE path = ?', (path,))
+    row = cursor.fetchone()
+    return row
+
+def insert_events_with_checkpoint(events, path, inode, size, offset, encoding, fingerprint, batch_size=5000):
+    """Insert events and advance the read checkpoint of path atomically.
+
+    The checkpoint is written in the same transaction as the rows, so a crash
+    either keeps both or neither and the next tick resumes at the right byte.
+    fingerprint identifies the start of the file (see ingest.process_increment).
+    """
+    logger.info(f"Inserting events from {path} up to offset {offset}")
+    with _transaction() as cursor:
+        total = _insert_batches(cursor, events, batch_size)
+        cursor.execute('''
+            INSERT OR REPLACE INTO ingest_checkpoints (path, inode, size, offset, encoding, fingerprint, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (path, inode, size, offset, encoding, fingerprint, datetime.now().isoformat(timespec='seconds')))
+    logger.info(f"Inserted {total} events, checkpoint at {offset}")
+    return total
+
+def is_processed(checksum):
+    """Return True if a file with this checksum has already been ingested"""
+    cursor = get_connection().cursor()
+    cursor.execute('SELECT 1 FROM processed_files WHERE checksum = ?', (checksum,))
+    return cursor.fetchone() is not None
+
+def insert_events_for_file(events, checksum, source, size, batch_size=5000):
+    """Insert the events of one file and journal its checksum atomically.
+
+    The processed_files row commits with the events, so after a crash a file
+    is either fully ingested and recorded, or neither. Returns 0 without
+    reading events if the checksum is already journaled.
+    """
+    logger.info(f"Inserting events from {source} (sha256 {checksum[:12]})")
+    with _transaction() as cursor:
+        # Checked again under the write lock in case another process got here first
+        cursor.execute('SELECT 1 FROM processed_files WHERE checksum = ?', (checksum,))
+        if cursor.fetchone() is not None:
+            logger.info(f"sha256 {checksum[:12]} was journaled meanwhile, skipping")
+            return 0
+        total = _insert_batches(cursor, events, batch_size)
+        cursor.execute('''
+            INSERT INTO processed_files (checksum, source, size, inserted, processed_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (checksum) DO NOTHING
+        ''', (checksum, source, size, total, datetime.now().isoformat(timespec='seconds')))
+    logger.info(f"Inserted {total} events")
+    return total
+
+def next_archive_number(base_name, highest_existing):
+    """Reserve and return the next archive sequence number for base_name.
+
+    highest_existing() is only called the first time a name is archived, to
+    continue the numbering of archives written before the counter existed.
+    """
+    with _transaction() as cursor:
+        row = cursor.execute('SELECT last FROM archive_sequence WHERE base_name = ?', (base_name,)).fetchone()
+        number = (row[0] if row else highest_existing()) + 1
+        cursor.execute('''
+            INSERT INTO archive_sequence (base_name, last) VALUES (?, ?)
+            ON CONFLICT (base_name) DO UPDATE SET last = excluded.last
+        ''', (base_name, number))
+    return number
+
 def get_users_on_site(in_event_ids, out_event_ids, target_date=None):
     if target_date is None:
         target_date = date.today().isoformat()
     logger.info(f"Getting users on site for date {target_date}")
-    db_path = 'events.db'
-    conn = sql.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('SELECT name, surname, id_point FROM events WHERE date = ? ORDER BY name, surname, time DESC', (target_date,))
+    try:
+        start = _day_start(target_date)
+    except ValueError:
+        logger.warning(f"Invalid date {target_date}")
+        return []
+    cursor = get_connection().cursor()
+    cursor.execute('''
+        SELECT e.person_id, p.name, p.surname, e.id_point
+        FROM events e JOIN people p ON p.id = e.person_id
+        WHERE e.ts >= ? AND e.ts < ?
+        ORDER BY e.ts
+    ''', (start, start + 86400))
     rows = cursor.fetchall()
-    conn.close()
     logger.debug(f"Found {len(rows)} events for date {target_date}")
-    
-    on_site = []
-    current_person = None
-    for row in rows:
-        name, surname, id_point = row
-        person = (name, surname)
-        if person != current_person:
-            current_person = person
-            if id_point in in_event_ids:
-                on_site.append(person)
+
+    # Rows are in time order, so the last one seen per person is their latest event
+    last_event = {}
+    for person_id, name, surname, id_point in rows:
+        last_event[person_id] = (name, surname, id_point)
+    on_site = sorted((name, surname) for name, surname, id_point in last_event.values() if id_point in in_event_ids)
     logger.info(f"Users on site: {on_site}")
     return on_site
 
 
+def get_data_version(conn):
+    """Return PRAGMA data_version, which changes when another connection commits"""
+    return conn.execute('PRAGMA data_version').fetchone()[0]
+
+def get_events_after(conn, after_id, target_date):
+    """Return (max_id, rows) for events on target_date with id > after_id.
+
+    rows are (person_id, name, surname, ts, id_point) in time order; max_id is
+    the highest event id in the whole table, read in the same snapshot so the
+    next call with after_id=max_id misses nothing.
+    """
+    start = _day_start(target_date)
+    cursor = conn.cursor()
+    cursor.execute('BEGIN')
+    try:
+        max_id = cursor.execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()[0]
+        cursor.execute('''
+            SELECT e.person_id, p.name, p.surname, e.ts, e.id_point
+            FROM events e JOIN people p ON p.id = e.person_id
+            WHERE e.id > ? AND e.id <= ? AND e.ts >= ? AND e.ts < ?
+            ORDER BY e.ts
+        ''', (after_id, max_id, start, start + 86400))
+        rows = cursor.fetchall()
+    finally:
+        cursor.execute('COMMIT')
+    return max_id, rows
+
+# Bounds used when a date range is open on either side
+MIN_TS = -(1 << 62)
+MAX_TS = 1 << 62
+
+def _range_bounds(start_date=None, end_date=None):
+    """Return [start, end) timestamps for inclusive ISO dates; raises ValueError on bad dates"""
+    start = _day_start(start_date) if start_date else MIN_TS
+    end = _day_start(end_date) + 86400 if end_date else MAX_TS
+    return start, end
+
+def get_events_page(start_date=None, end_date=None, after=None, limit=1000):
+    """Return up to limit events between the inclusive dates, in (ts, id) order.
+
+    Rows are (id, ts, date, time, name, surname, id_point). after is the (ts, id) of the
+    last row of the previous page; pages are found by seeking the ts index,
+    so the cost of a page does not grow with how far into the range it is.
+    """
+    start, end = _range_bounds(start_date, end_date)
+    after_ts, after_id = after if after else (start, 0)
+    cursor = get_connection().cursor()
+    cursor.execute('''
+        SELECT e.id, e.ts, p.name, p.surname, e.id_point
+        FROM events e JOIN people p ON p.id = e.person_id
+        WHERE e.ts >= ? AND e.ts < ? AND (e.ts > ? OR e.id > ?)
+        ORDER BY e.ts, e.id
+        LIMIT ?
+    ''', (max(start, after_ts), end, after_ts, after_id, limit))
+    return [(event_id, ts, *_format_timestamp(ts)[::-1], name, surname, id_point)
+            for event_id, ts, name, surname, id_point in cursor.fetchall()]
+
+def iter_events_range(start_date=None, end_date=None, after=None, batch_size=5000):
+    """Yield every event between the inclusive dates page by page, in constant memory"""
+    while True:
+        rows = get_events_page(start_date, end_date, after, batch_size)
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        event_id, ts = rows[-1][:2]
+        after = (ts, event_id)
+
 def get_all_events():
     logger.info("Getting all events")
-    db_path = 'events.db'
-    conn = sql.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('SELECT time, date, name, surname, id_point FROM events ORDER BY date, time')
-    rows = cursor.fetchall()
-    conn.close()
+    rows = [(time_str, date_str, name, surname, id_point)
+            for event_id, ts, date_str, time_str, name, surname, id_point in iter_events_range()]
     logger.info(f"Retrieved {len(rows)} events")
     return rows
 
+def _placeholders(values):
+    return ', '.join('?' * len(values))
+
+_report_cache = None
+
+def _get_report_cache():
+    global _report_cache
+    if _report_cache is None:
+        try:
+            maxsize = files.get_setting("report_cache_size", 256)
+        except FileNotFoundError:
+            maxsize = 256
+        _report_cache = ReportCache(maxsize)
+    return _report_cache
+
+def report_cache_info():
+    """Return hit/miss counters and size of the report cache"""
+    return _get_report_cache().info()
+
+def _period_version(first_day, end_day):
+    cursor = get_connection().cursor()
+    cursor.execute('SELECT COALESCE(SUM(version), 0) FROM day_versions WHERE day >= ? AND day < ?', (first_day, end_day))
+    return cursor.fetchone()[0]
+
+def _setting(key, default):
+    """files.get_setting, or default when there is no config.json (tools, benchmarks)"""
+    try:
+        return files.get_setting(key, default)
+    except FileNotFoundError:
+        return default
+
+def _report_engine():
+    """Return the configured report engine: "sql" (default) or "pandas" """
+    return _setting("report_engine", "sql")
+
+def _vectorized_time_spent(start, end, in_event_ids, out_event_ids, out_excludes_in):
+    from . import vectorized
+    logger.info(f"Calculating time spent with the vectorized engine for ts {start}-{end}")
+    time_spent = vectorized.time_spent(get_connection(), start, end, in_event_ids, out_event_ids, out_excludes_in)
+    logger.info(f"Calculated time spent for {len(time_spent)} users")
+    return time_spent
+
 def calculate_time_spent(target_date, in_event_ids, out_event_ids):
+    """Return (name, surname, minutes) from each person's first IN to last OUT on target_date.
+
+    Results are cached until an ingest writes rows for target_date.
+    """
+    try:
+        day = _day_start(target_date) // 86400
+    except ValueError:
+        logger.warning(f"Invalid date {target_date}")
+        return []
+    if _report_engine() == 'pandas':
+        compute = partial(_vectorized_time_spent, day * 86400, (day + 1) * 86400, in_event_ids, out_event_ids, False)
+    else:
+        compute = partial(_compute_time_spent, target_date, in_event_ids, out_event_ids)
+    key = ('day', day, tuple(sorted(in_event_ids)), tuple(sorted(out_event_ids)))
+    return _get_report_cache().get_or_compute(key, _period_version(day, day + 1), compute)
+
+def _compute_time_spent(target_date, in_event_ids, out_event_ids):
+    """calculate_time_spent from the few daily_attendance rows of each person"""
     logger.info(f"Calculating time spent on site for date {target_date}")
-    db_path = 'events.db'
-    conn = sql.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('SELECT name, surname, time, id_point FROM events WHERE date = ? ORDER BY name, surname, time', (target_date,))
-    rows = cursor.fetchall()
-    conn.close()
-    logger.debug(f"Found {len(rows)} events for date {target_date}")
-    
-    from collections import defaultdict
-    person_events = defaultdict(list)
-    for row in rows:
-        name, surname, time_str, id_point = row
-        person = (name, surname)
-        person_events[person].append((time_str, id_point))
-    
-    time_spent = []
-    date_obj = datetime.strptime(target_date, '%Y-%m-%d').date()
-    
-    for person, events in person_events.items():
-        first_in = None
-        last_out = None
-        for time_str, id_point in events:
-            time_obj = datetime.strptime(time_str, '%H:%M:%S').time()
-            if id_point in in_event_ids:
-                if first_in is None:
-                    first_in = time_obj
-            if id_point in out_event_ids:
-                last_out = time_obj
-        
-        if first_in and last_out and last_out > first_in:
-            diff = datetime.combine(date_obj, last_out) - datetime.combine(date_obj, first_in)
-            minutes = diff.total_seconds() / 60
-            time_spent.append((person[0], person[1], minutes))
-            logger.debug(f"{person}: {minutes} minutes")
-    
+    start = _day_start(target_date)
+    in_ids, out_ids = list(in_event_ids), list(out_event_ids)
+    cursor = get_connection().cursor()
+    cursor.execute(f'''
+        SELECT p.name, p.surname, (a.last_out - a.first_in) / 60.0
+        FROM (
+            SELECT person_id,
+                   MIN(CASE WHEN id_point IN ({_placeholders(in_ids)}) THEN first_ts END) AS first_in,
+                   MAX(CASE WHEN id_point IN ({_placeholders(out_ids)}) THEN last_ts END) AS last_out
+            FROM daily_attendance
+            WHERE day = ?
+            GROUP BY person_id
+        ) a JOIN people p ON p.id = a.person_id
+        WHERE a.last_out > a.first_in
+        ORDER BY p.name, p.surname
+    ''', (*in_ids, *out_ids, start // 86400))
+    time_spent = cursor.fetchall()
     logger.info(f"Calculated time spent for {len(time_spent)} users")
     return time_spent
 
+def _month_range(year, month):
+    """Return timestamps [first day of month, first day of next month); raises ValueError on a bad month"""
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return _day_start(f"{year}-{month:02d}-01"), _day_start(f"{next_year}-{next_month:02d}-01")
+
 def calculate_monthly_time_spent(year, month, in_event_ids, out_event_ids):
+    """Return (name, surname, minutes) of time on site per person in the month.
+
+    By default minutes is the sum of the person's IN/OUT sessions (see
+    calculate_monthly_sessions). With monthly_report_mode "span" it is the
+    time from the earliest IN to the latest OUT of the month instead, where an
+    id listed as both IN and OUT counts as IN only. Results are cached until
+    an ingest writes rows for a day of the month, so closed months are
+    computed once.
+    """
+    if _setting("monthly_report_mode", "sessions") != 'span':
+        return [(name, surname, total) for name, surname, total, _ in
+                calculate_monthly_sessions(year, month, in_event_ids, out_event_ids)]
+    try:
+        start, end = _month_range(year, month)
+    except ValueError:
+        logger.warning(f"Invalid month {year}-{month}")
+        return []
+    if _report_engine() == 'pandas':
+        compute = partial(_vectorized_time_spent, start, end, in_event_ids, out_event_ids, True)
+    else:
+        compute = partial(_compute_monthly_time_spent, year, month, in_event_ids, out_event_ids)
+    key = ('month', year, month, tuple(sorted(in_event_ids)), tuple(sorted(out_event_ids)))
+    return _get_report_cache().get_or_compute(key, _period_version(start // 86400, end // 86400), compute)
+
+_engine_warned = False
+
+def _warn_engine_unused():
+    """Warn once that report_engine "pandas" does not apply to session reports"""
+    global _engine_warned
+    if not _engine_warned and _report_engine() == 'pandas':
+        logger.warning('report_engine "pandas" is not used for monthly reports in "sessions" mode; '
+                       'set monthly_report_mode to "span" to use it')
+        _engine_warned = True
+
+def calculate_monthly_sessions(year, month, in_event_ids, out_event_ids):
+    """Return (name, surname, total_minutes, daily) per person from one sweep over the month's events.
+
+    An IN opens a session and the next OUT closes it, so a person can have
+    several sessions a day. A session that crosses midnight (an overnight
+    shift) counts for the day it started, including one that ends after the
+    month does. A repeated IN while a session is open is ignored unless the
+    open session is older than max_session_hours (default 16); INs never
+    closed within that limit and OUTs without an IN are dropped. An id
+    listed as both IN and OUT counts as IN. daily is [(date, minutes), ...]
+    in date order. Cached like the other reports. The sweep is sequential
+    per person, so report_engine does not apply here.
+    """
+    _warn_engine_unused()
+    try:
+        start, end = _month_range(year, month)
+    except ValueError:
+        logger.warning(f"Invalid month {year}-{month}")
+        return []
+    max_seconds = int(_setting("max_session_hours", 16) * 3600)
+    # OUTs up to max_seconds after the month can still close its last sessions
+    first_day, last_day = start // 86400, (end + max_seconds) // 86400 + 1
+    key = ('sessions', year, month, max_seconds, tuple(sorted(in_event_ids)), tuple(sorted(out_event_ids)))
+    return _get_report_cache().get_or_compute(
+        key, _period_version(first_day, last_day),
+        lambda: _compute_monthly_sessions(start, end, max_seconds, in_event_ids, out_event_ids))
+
+def _compute_monthly_sessions(start, end, max_seconds, in_event_ids, out_event_ids):
+    logger.info(f"Calculating monthly sessions for ts {start}-{end}")
+    in_ids = frozenset(in_event_ids)
+    out_ids = frozenset(out_event_ids) - in_ids
+    cursor = get_connection().cursor()
+    # In ts order straight off the index; open sessions are tracked per person
+    cursor.execute('''
+        SELECT person_id, ts, id_point FROM events
+        WHERE ts >= ? AND ts < ?
+        ORDER BY ts
+    ''', (start, end + max_seconds))
+    open_since = {}
+    seconds = {}
+    for person_id, ts, id_point in cursor:
+        if id_point in in_ids:
+            since = open_since.get(person_id)
+            if since is None or ts - since > max_seconds:
+                if ts < end:
+                    open_since[person_id] = ts
+                else:
+                    # Sessions starting after the month belong to the next report
+                    open_since.pop(person_id, None)
+        elif id_point in out_ids:
+            since = open_since.pop(person_id, None)
+            if since is not None and since < ts <= since + max_seconds:
+                per_day = seconds.setdefault(person_id, {})
+                day = since // 86400
+                per_day[day] = per_day.get(day, 0) + ts - since
+
+    names = {person_id: (name, surname) for person_id, name, surname in
+             cursor.execute('SELECT id, name, surname FROM people') if person_id in seconds}
+    sessions = []
+    for person_id, per_day in seconds.items():
+        daily = [(date.fromordinal(day + EPOCH_ORDINAL).isoformat(), secs / 60.0) for day, secs in sorted(per_day.items())]
+        sessions.append((*names[person_id], sum(per_day.values()) / 60.0, daily))
+    sessions.sort(key=lambda row: (row[0], row[1]))
+    logger.info(f"Calculated monthly sessions for {len(sessions)} users")
+    return sessions
+
+def _compute_monthly_time_spent(year, month, in_event_ids, out_event_ids):
+    """calculate_monthly_time_spent from the month's daily_attendance rows, not raw events"""
     logger.info(f"Calculating monthly time spent for {year}-{month:02d}")
-    db_path = 'events.db'
-    conn = sql.connect(db_path)
-    cursor = conn.cursor()
-    month_str = f"{year}-{month:02d}"
-    cursor.execute('SELECT name, surname, date, time, id_point FROM events WHERE date LIKE ? ORDER BY name, surname, date, time', (month_str + '-%',))
-    rows = cursor.fetchall()
-    conn.close()
-    logger.debug(f"Found {len(rows)} events for month {month_str}")
-    
-    from collections import defaultdict
-    person_events = defaultdict(list)
-    for row in rows:
-        name, surname, date_str, time_str, id_point = row
-        person = (name, surname)
-        person_events[person].append((date_str, time_str, id_point))
-    
-    monthly_time = []
-    for person, events in person_events.items():
-        # Find earliest in and latest out
-        earliest_in = None
-        latest_out = None
-        for date_str, time_str, id_point in events:
-            dt = datetime.strptime(f"{date_str} {time_str}", '%Y-%m-%d %H:%M:%S')
-            if id_point in in_event_ids:
-                if earliest_in is None or dt < earliest_in:
-                    earliest_in = dt
-            elif id_point in out_event_ids:
-                if latest_out is None or dt > latest_out:
-                    latest_out = dt
-        
-        if earliest_in and latest_out and latest_out > earliest_in:
-            diff = latest_out - earliest_in
-            total_minutes = diff.total_seconds() / 60
-            monthly_time.append((person[0], person[1], total_minutes))
-            logger.debug(f"{person}: {total_minutes} minutes in month")
-    
+    start, end = _month_range(year, month)
+    in_ids, out_ids = list(in_event_ids), list(out_event_ids)
+    cursor = get_connection().cursor()
+    cursor.execute(f'''
+        SELECT p.name, p.surname, (a.latest_out - a.earliest_in) / 60.0
+        FROM (
+            SELECT person_id,
+                   MIN(CASE WHEN id_point IN ({_placeholders(in_ids)}) THEN first_ts END) AS earliest_in,
+                   MAX(CASE WHEN id_point IN ({_placeholders(out_ids)})
+                             AND id_point NOT IN ({_placeholders(in_ids)}) THEN last_ts END) AS latest_out
+            FROM daily_attendance
+            WHERE day >= ? AND day < ?
+            GROUP BY person_id
+        ) a JOIN people p ON p.id = a.person_id
+        WHERE a.latest_out > a.earliest_in
+        ORDER BY p.name, p.surname
+    ''', (*in_ids, *out_ids, *in_ids, start // 86400, end // 86400))
+    monthly_time = cursor.fetchall()
     logger.info(f"Calculated monthly time for {len(monthly_time)} users")
     return monthly_time
 
+def rebuild_daily_attendance():
+    """Recompute daily_attendance from all events; returns the number of rows written"""
+    logger.info("Rebuilding daily attendance summary")
+    with _transaction() as cursor:
+        cursor.execute('DELETE FROM daily_attendance')
+        _fill_daily_attendance(cursor)
+        rows = cursor.rowcount
+        cursor.execute('''
+            INSERT INTO day_versions (day, version)
+            SELECT DISTINCT day, 1 FROM daily_attendance WHERE true
+            ON CONFLICT (day) DO UPDATE SET version = version + 1
+        ''')
+    logger.info(f"Rebuilt {rows} daily attendance rows")
+    return rows
@@ -1,6 +1,87 @@
-import pandas as pd
+import codecs
+import gzip
+import hashlib
+import io
+import os
+import sys
+from contextlib import contextmanager
 from datetime import datetime
+from typing import NamedTuple
 from loguru import logger
+from . import smb
+
+CHUNK_SIZE = 1024 * 1024
+# Leading bytes hashed to tell a recreated file from the one a checkpoint was
+# taken on, since a new file can reuse the old inode
+FINGERPRINT_SIZE = 1024
+# Bytes examined to choose a file's encoding; PREvents files repeat Polish
+# names on nearly every line, so this is plenty to see non-ASCII text
+ENCODING_SAMPLE_SIZE = 256 * 1024
+BOMS = [(codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16')]
+
+
+def _sniff_encoding(sample, complete=False):
+    """Pick the encoding of a file from its leading bytes.
+
+    A BOM decides outright. Text with a NUL in every other byte is UTF-16.
+    Otherwise UTF-8 wins only if the sample holds non-ASCII bytes that form
+    valid UTF-8 (cp1250 text practically never does); failing that the first
+    of cp1250, cp1252 that decodes the sample, then latin1. complete says
+    the sample is the whole file, so a multi-byte sequence may not be cut
+    off at its end.
+    """
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding
+    if sample.count(0) > len(sample) // 4:
+        return 'utf-16-le' if sample[1::2].count(0) > sample[::2].count(0) else 'utf-16-be'
+    if not sample.isascii():
+        try:
+            codecs.getincrementaldecoder('utf-8')().decode(sample, final=complete)
+            return 'utf-8'
+        except UnicodeDecodeError:
+            pass
+    for encoding in ('cp1250', 'cp1252'):
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=complete)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return 'latin1'
+
+
+class _PrefixedReader(io.RawIOBase):
+    """Raw stream that returns already read bytes before the rest of f"""
+
+    def __init__(self, prefix, f):
+        self._prefix = memoryview(prefix)
+        self._f = f
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._prefix:
+            n = min(len(buffer), len(self._prefix))
+            buffer[:n] = self._prefix[:n]
+            self._prefix = self._prefix[n:]
+            return n
+        data = self._f.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class Event(NamedTuple):
+    """One access-control event as stored in the events table.
+
+    Field order matches the INSERT column order in database.insert_events,
+    so records can be handed to executemany without being rebuilt.
+    """
+    time: str
+    date: str
+    name: str
+    surname: str
+    id_point: int
 
 
 
@@ -18,115 +99,185 @@ class EventProcessor:
     @classmethod
     def from_csv(cls, file_path):
         logger.info(f"Reading events from CSV: {file_path}")
-        
-        # Check if it's an SMB path
-        if file_path.startswith('\\\\') or file_path.startswith('//'):
-            logger.info("Detected SMB path, using SMB protocol")
-            content = cls._read_smb_file(file_path)
-        else:
-            logger.info("Using local file access")
-            content = cls._read_file_with_encoding_detection(file_path, use_smb=False)
-        
-        lines = content.splitlines()
-        clean_lines = [line for line in lines if not line.startswith('#') and line.strip()]
-        logger.debug(f"Clean lines: {len(clean_lines)}")
-        
-        # Parse CSV data, handling variable column counts
-        data = []
-        for line in clean_lines:
+        events = list(cls.iter_csv(file_path))
+        logger.info(f"Loaded {len(events)} events from CSV")
+        return events
+
+    @classmethod
+    def iter_csv(cls, file_path, event_ids=None, require_rows=True):
+        """Yield Event records from a CSV file one line at a time.
+
+        When event_ids is given, rows with other id_point values are dropped
+        during the parse so they are never materialized. A file without any
+        valid data row raises unless require_rows is False.
+        """
+        with cls._open_text(file_path) as f:
+            yield from cls._parse_lines(f, event_ids, require_rows)
+
+    @staticmethod
+    def _parse_lines(lines, event_ids=None, require_rows=True):
+        intern = sys.intern
+        if event_ids is not None:
+            event_ids = frozenset(event_ids)
+        total = 0
+        valid = 0
+        kept = 0
+        for line in lines:
+            if line.startswith('#') or not line.strip():
+                continue
+            total += 1
             parts = line.strip().split(';')
             # Remove empty trailing fields
             while parts and parts[-1] == '':
                 parts.pop()
-            
-            # Skip if not enough columns (need at least time, date, id_point)
+
+            # Skip if not enough columns (need time, date, name, surname, id_point)
             if len(parts) < 5:
                 logger.debug(f"Skipping line with insufficient columns ({len(parts)}): {line[:50]}...")
                 continue
-            
-            # Pad with empty strings if needed to ensure 5 columns
-            while len(parts) < 5:
-                parts.append('')
-            
-            # Take only first 5 columns (time, date, name, surname, id_point)
-            if len(parts) >= 5:
-                data.append(parts[:5])
-            else:
-                logger.debug(f"Skipping malformed line: {line[:50]}...")
-        
-        logger.info(f"Valid data rows: {len(data)} (filtered from {len(clean_lines)} total lines)")
-        
-        if not data:
-            raise Exception("No valid data rows found in CSV file")
-        
-        df = pd.DataFrame(data, columns=['time', 'date', 'name', 'surname', 'id_point'])
-        df['id_point'] = df['id_point'].astype(int)
-        events = [cls(**row) for _, row in df.iterrows()]
-        logger.info(f"Loaded {len(events)} events from CSV")
-        return events
-    
-    @staticmethod
-    def _read_file_with_encoding_detection(file_path, use_smb=False):
-        """Read file with automatic encoding detection"""
-        # Try Polish-friendly encodings first
-        encodings_to_try = ['cp1250', 'utf-8', 'utf-16', 'cp1252', 'latin1']
-        content = None
-        
-        for encoding in encodings_to_try:
+
             try:
-                logger.debug(f"Trying to read file with encoding: {encoding}")
-                if use_smb:
-                    import smbclient
-                    with smbclient.open_file(file_path, mode='r', encoding=encoding) as f:
-                        content = f.read()
-                else:
-                    with open(file_path, 'r', encoding=encoding) as f:
-                        content = f.read()
-                logger.info(f"Successfully read file using {encoding} encoding")
-                return content
-            except UnicodeDecodeError:
-                logger.debug(f"Failed to decode with {encoding}, trying next encoding...")
+                id_point = int(parts[4])
+            except ValueError:
+                logger.debug(f"Skipping line with invalid id_point: {line[:50]}...")
                 continue
-            except Exception as enc_error:
-                logger.debug(f"Error with {encoding}: {enc_error}")
+            valid += 1
+
+            if event_ids is not None and id_point not in event_ids:
                 continue
-        
-        raise Exception("Failed to read file with any supported encoding")
-        
+            kept += 1
+            # Dates and names repeat on almost every line, so share one copy
+            yield Event(parts[0], intern(parts[1]), intern(parts[2]), intern(parts[3]), id_point)
+
+        logger.info(f"Valid data rows: {valid} (filtered from {total} total lines), kept {kept}")
+        if require_rows and not valid:
+            raise Exception("No valid data rows found in CSV file")
+
+    @classmethod
+    @contextmanager
+    def _open_text(cls, file_path):
+        """Open a local or SMB file as a text stream in its detected encoding.
+
+        The encoding is sniffed from the first ENCODING_SAMPLE_SIZE bytes, which
+        are then replayed to the decoder, so the file is read exactly once.
+        """
+        if smb.is_smb_path(file_path):
+            logger.info("Detected SMB path, using SMB protocol")
+            f = cls._open_raw(cls._smb_url(file_path), use_smb=True)
+        else:
+            logger.info("Using local file access")
+            f = cls._open_raw(file_path, use_smb=False)
+        with f:
+            sample = f.read(ENCODING_SAMPLE_SIZE)
+            encoding = _sniff_encoding(sample, complete=len(sample) < ENCODING_SAMPLE_SIZE)
+            logger.info(f"Detected {encoding} encoding")
+            stream = io.BufferedReader(_PrefixedReader(sample, f), CHUNK_SIZE)
+            # A byte the sample did not predict becomes U+FFFD instead of aborting the read
+            yield io.TextIOWrapper(stream, encoding=encoding, errors='replace')
+
     @staticmethod
-    def _read_smb_file(smb_path):
-        """Read file from SMB share using smbprotocol with proper Windows authentication"""
-        try:
-            import smbclient
-            
-            # Parse SMB path: \\server\share\path\to\file or //server/share/path/to/file
-            if smb_path.startswith('\\\\'):
-                smb_path = smb_path[2:]  # Remove leading \\
-            elif smb_path.startswith('//'):
-                smb_path = smb_path[2:]  # Remove leading //
-            
-            parts = smb_path.replace('\\', '/').split('/')
-            server = parts[0]
-            share = parts[1]
-            file_path = '/'.join(parts[2:])
-            
-            logger.info(f"Connecting to SMB: server={server}, share={share}, file={file_path}")
-            
-            # Configure smbclient to use current user's credentials
-            # This will automatically use the Windows user's session
-            smbclient.ClientConfig(username=None, password=None)  # Use integrated auth
-            
-            # Build the full SMB URL
-            file_path_windows = file_path.replace('/', '\\')
-            smb_url = f"\\\\{server}\\{share}\\{file_path_windows}"
-            
-            # Read the file using encoding detection
-            return EventProcessor._read_file_with_encoding_detection(smb_url, use_smb=True)
-            
-        except Exception as e:
-            logger.error(f"Failed to read SMB file: {e}")
-            raise
-    
+    def _open_raw(path, use_smb=False):
+        """Open an already resolved local path or SMB URL for binary reading.
+
+        Gzip-compressed archives (.gz) are decompressed as they are read.
+        """
+        if use_smb:
+            return smb.open_file(path)
+        if path.endswith('.gz'):
+            return gzip.open(path, 'rb')
+        return open(path, 'rb')
+
+    @classmethod
+    def _open_binary(cls, file_path):
+        if smb.is_smb_path(file_path):
+            return cls._open_raw(cls._smb_url(file_path), use_smb=True)
+        return cls._open_raw(file_path)
+
+    @classmethod
+    def stat(cls, file_path):
+        """Return (inode, size) identifying the file currently at file_path"""
+        if smb.is_smb_path(file_path):
+            st = smb.stat(file_path)
+        else:
+            st = os.stat(file_path)
+        return st.st_ino, st.st_size
+
+    @classmethod
+    def fingerprint(cls, file_path, length):
+        """Return the SHA-256 hex digest of the first length bytes of the file"""
+        with cls._open_binary(file_path) as f:
+            return hashlib.sha256(f.read(length)).hexdigest()
+
+    @classmethod
+    def detect_range_encoding(cls, file_path, start, end):
+        """Return (encoding, settled) for the bytes between offsets start and end.
+
+        The sample is taken from the first chunk holding non-ASCII bytes, as
+        ASCII decodes the same in every candidate. settled is False when the
+        range is plain ASCII: the encoding is then only a guess that bytes
+        appended later may contradict.
+        """
+        with cls._open_binary(file_path) as f:
+            f.seek(start)
+            pos = start
+            while pos < end:
+                chunk = f.read(min(ENCODING_SAMPLE_SIZE, end - pos))
+                if not chunk:
+                    break
+                pos += len(chunk)
+                # NULs mean UTF-16, which _sniff_encoding recognizes
+                if not chunk.isascii() or 0 in chunk:
+                    return _sniff_encoding(chunk, complete=pos >= end), True
+        return _sniff_encoding(b''), False
+
+    @classmethod
+    def complete_lines_end(cls, file_path, start, size):
+        """Return the offset just past the last newline between start and size.
+
+        A writer may be in the middle of appending a line, so anything after
+        the last newline is left for the next read.
+        """
+        with cls._open_binary(file_path) as f:
+            pos = size
+            while pos > start:
+                chunk_start = max(start, pos - 64 * 1024)
+                f.seek(chunk_start)
+                chunk = f.read(pos - chunk_start)
+                newline = chunk.rfind(b'\n')
+                if newline != -1:
+                    return chunk_start + newline + 1
+                pos = chunk_start
+        return start
+
+    @classmethod
+    def iter_appended(cls, file_path, start, end, encoding, event_ids=None):
+        """Yield Event records from the complete lines between byte offsets start and end.
+
+        Lines are split on single newline bytes, so this only works for
+        byte-oriented encodings (cp1250, utf-8, ...), not UTF-16.
+        """
+        if encoding.lower().startswith('utf-16'):
+            raise Exception("Incremental reading does not support UTF-16 files")
+        with cls._open_binary(file_path) as f:
+            f.seek(start)
+            yield from cls._parse_lines(cls._decoded_lines(f, end - start, encoding), event_ids, require_rows=False)
+
+    @staticmethod
+    def _decoded_lines(f, remaining, encoding):
+        while remaining > 0:
+            raw = f.readline(remaining)
+            if not raw:
+                break
+            remaining -= len(raw)
+            yield raw.decode(encoding, errors='replace')
+
+    @staticmethod
+    def _smb_url(smb_path):
+        """Return the UNC path for an SMB location"""
+        server, share, file_path = smb.split_path(smb_path)
+        logger.info(f"Connecting to SMB: server={server}, share={share}, file={file_path}")
+        return smb.to_url(smb_path)
+
     @staticmethod
     def filter_events(events, event_ids):
         logger.debug(f"Filtering {len(events)} events with ids {event_ids}")
@@ -136,6 +287,8 @@ class EventProcessor:
     
 def read_events(events_file, event_ids):
     logger.info(f"Reading and filtering events from {events_file}")
-    all_events = EventProcessor.from_csv(events_file)
-    filtered_events = EventProcessor.filter_events(all_events, event_ids)
-    return filtered_events
\ No newline at end of file
+    return list(iter_events(events_file, event_ids))
+
+def iter_events(events_file, event_ids, require_rows=True):
+    """Stream events with an id_point in event_ids from events_file"""
+    return EventProcessor.iter_csv(events_file, event_ids, require_rows)
@@ -7,135 +7,94 @@ def ensure_archive_folder(archive_folder):
         os.makedirs(archive_folder)
         logger.info(f"Created archive folder: {archive_folder}")
 
-def load_config():
-    logger.info("Loading config from config.json")
+def _read_config():
     import json
     with open('config.json', 'r', encoding='utf-8') as config_file:
-        config = json.load(config_file)
-        in_event_ids = config.get("in_event_ids", [])
-        out_event_ids = config.get("out_event_ids", [])
-        events_file = config.get("events_file", "PREvents.csv")
-        archive_folder = config.get("archive_folder", "archive")
-        processing_interval_minutes = config.get("processing_interval_minutes", 30)
-        event_ids = in_event_ids + out_event_ids
-        logger.info(f"Config: in={in_event_ids}, out={out_event_ids}, file={events_file}, archive={archive_folder}, interval={processing_interval_minutes}")
-        return in_event_ids, out_event_ids, event_ids, events_file, archive_folder, processing_interval_minutes
+        return json.load(config_file)
+
+def load_config():
+    logger.info("Loading config from config.json")
+    config = _read_config()
+    in_event_ids = config.get("in_event_ids", [])
+    out_event_ids = config.get("out_event_ids", [])
+    events_file = config.get("events_file", "PREvents.csv")
+    archive_folder = config.get("archive_folder", "archive")
+    processing_interval_minutes = config.get("processing_interval_minutes", 30)
+    event_ids = in_event_ids + out_event_ids
+    logger.info(f"Config: in={in_event_ids}, out={out_event_ids}, file={events_file}, archive={archive_folder}, interval={processing_interval_minutes}")
+    return in_event_ids, out_event_ids, event_ids, events_file, archive_folder, processing_interval_minutes
+
+def get_setting(key, default=None):
+    """Return an optional setting from config.json, or default if it is unset"""
+    return _read_config().get(key, default)
+
+
+def archived_files(base_name, archive_folder):
+    """Return (number, path) of every archived copy of base_name, oldest first.
 
+    Copies are base_name.N or base_name.N.gz, directly in archive_folder or in
+    its date partition folders; N orders them, so .10 comes after .9.
+    """
+    prefix = base_name + '.'
+    found = []
+    for folder, _, names in os.walk(archive_folder):
+        for name in names:
+            if not name.startswith(prefix):
+                continue
+            number = name[len(prefix):]
+            if number.endswith('.gz'):
+                number = number[:-3]
+            if number.isdigit():
+                found.append((int(number), os.path.join(folder, name)))
+    return sorted(found)
 
-def archive_file( events_file, archive_folder):
-    logger.info(f"Archiving {events_file} to {archive_folder}")
+def _archive_path(base_name, archive_folder):
+    """Return the path for the next archived copy of base_name.
+
+    The sequence number comes from a counter in the database, so the archive
+    folder is scanned only once, to seed the counter from existing copies.
+    """
+    from datetime import datetime
+    from . import database
+
+    def highest_existing():
+        logger.info(f"Seeding archive sequence for {base_name} from {archive_folder}")
+        return max((number for number, _ in archived_files(base_name, archive_folder)), default=0)
+
+    number = database.next_archive_number(base_name, highest_existing)
+    folder = archive_folder
+    partition = get_setting("archive_partition")
+    if partition in ('month', 'day'):
+        now = datetime.now()
+        parts = [f"{now.year:04d}", f"{now.month:02d}"] + ([f"{now.day:02d}"] if partition == 'day' else [])
+        folder = os.path.join(archive_folder, *parts)
+        os.makedirs(folder, exist_ok=True)
+    suffix = '.gz' if get_setting("archive_compression", "gzip") == 'gzip' else ''
+    return os.path.join(folder, f"{base_name}.{number}{suffix}")
+
+def _store(src_path, dest_path):
+    """Move src_path to dest_path, gzip-compressing it on the way if dest_path ends in .gz"""
     import shutil
-    import os
-    
-    # Check if source is SMB path
-    if events_file.startswith('\\\\') or events_file.startswith('//'):
-        logger.info("Source is SMB path, reading content first")
-        # For SMB files, we need to read the content and write to local archive
-        try:
-            from app.events import EventProcessor
-            content = EventProcessor._read_smb_file(events_file)
-            
-            base_name = os.path.basename(events_file.replace('\\', '/'))
-            archive_dir = archive_folder
-            
-            if not os.path.exists(archive_dir):
-                os.makedirs(archive_dir)
-            
-            # List files in archive_dir
-            try:
-                files = os.listdir(archive_dir)
-            except OSError:
-                files = []
-            
-            # Filter files that start with base_name + '.'
-            matching_files = [f for f in files if f.startswith(base_name + '.')]
-            
-            if not matching_files:
-                next_num = 1
-            else:
-                # Find the most recently modified matching file
-                mtimes = [(f, os.path.getmtime(os.path.join(archive_dir, f))) for f in matching_files]
-                last_file, _ = max(mtimes, key=lambda x: x[1])
-                
-                # Parse the number from the filename
-                parts = last_file.split('.')
-                if len(parts) >= 2 and parts[-1].isdigit():
-                    num = int(parts[-1])
-                    next_num = num + 1
-                else:
-                    next_num = 1
-            
-            # Destination path
-            dest_filename = f"{base_name}.{next_num}"
-            dest_path = os.path.join(archive_dir, dest_filename)
-            
-            # Write content to archive
-            with open(dest_path, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
-            # Now delete the original SMB file to complete the "move" operation
-            try:
-                import smbclient
-                # Configure smbclient to use current user's credentials
-                smbclient.ClientConfig(username=None, password=None)
-                
-                # Build the SMB URL for deletion
-                smb_url = events_file.replace('/', '\\')
-                smbclient.remove(smb_url)
-                logger.info(f"Deleted original SMB file: {events_file}")
-                
-            except Exception as delete_e:
-                logger.warning(f"Failed to delete original SMB file {events_file}: {delete_e}")
-                # Don't fail the entire operation if deletion fails
-            
-            logger.info(f"Archived (moved) SMB file {events_file} to {dest_path}")
-            return
-            
-        except Exception as e:
-            logger.error(f"Failed to archive SMB file: {e}")
-            raise
-    
-    # Original logic for local files
-    base_name = os.path.basename(events_file)
-    archive_dir = archive_folder
-    
-    if not os.path.exists(archive_dir):
-        os.makedirs(archive_dir)
-    
-    # List files in archive_dir
-    try:
-        files = os.listdir(archive_dir)
-    except OSError:
-        files = []
-    
-    # Filter files that start with base_name + '.'
-    matching_files = [f for f in files if f.startswith(base_name + '.')]
-    
-    if not matching_files:
-        next_num = 1
-    else:
-        # Find the most recently modified matching file
-        mtimes = [(f, os.path.getmtime(os.path.join(archive_dir, f))) for f in matching_files]
-        last_file, _ = max(mtimes, key=lambda x: x[1])
-        
-        # Parse the number from the filename
-        parts = last_file.split('.')
-        if len(parts) >= 2 and parts[-1].isdigit():
-            num = int(parts[-1])
-            next_num = num + 1
-        else:
-            # If the last part is not a digit, start from 1
-            next_num = 1
-    
-    # Source file path
-    src_path = events_file
-    
-    # Destination path
-    dest_filename = f"{base_name}.{next_num}"
-    dest_path = os.path.join(archive_dir, dest_filename)
-    
-    # Move the file
-    shutil.move(src_path, dest_path)
-    logger.info(f"Archived {src_path} to {dest_path}")
-    
+    if not dest_path.endswith('.gz'):
+        shutil.move(src_path, dest_path)
+        return
+    import gzip
+    partial_path = dest_path + '.part'
+    with open(src_path, 'rb') as src, gzip.open(partial_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.replace(partial_path, dest_path)
+    os.remove(src_path)
 
+def archive_local(path, base_name, archive_folder):
+    """Store the local file path in the archive as the next numbered copy of base_name.
+
+    Copies are gzip-compressed unless archive_compression is "none", and go
+    into YYYY/MM or YYYY/MM/DD subfolders when archive_partition is "month"
+    or "day". Returns the archived path.
+    """
+    if not os.path.exists(archive_folder):
+        os.makedirs(archive_folder)
+    dest_path = _archive_path(base_name, archive_folder)
+    _store(path, dest_path)
+    logger.info(f"Archived {path} to {dest_path}")
+    return dest_path
@@ -0,0 +1,237 @@
+import hashlib
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from functools import partial
+from . import database
+from . import events
+from . import files
+from . import smb
+from loguru import logger
+
+# Lock file in the spool folder held for the duration of a cycle
+LOCK_NAME = 'ingest.lock'
+
+def _remote_sibling(smb_path, name):
+    """Return the SMB path of name in the folder holding smb_path"""
+    return smb_path.replace('\\', '/').rsplit('/', 1)[0] + '/' + name
+
+def _fetch_claimed(claimed_path, spool_folder):
+    """Copy a claimed SMB file into the spool under the same name, then remove it from the share"""
+    spool_path = os.path.join(spool_folder, claimed_path.replace('\\', '/').rsplit('/', 1)[1])
+    if not os.path.exists(spool_path):
+        smb.fetch_to_spool(claimed_path, spool_folder, os.path.basename(spool_path))
+    try:
+        smb.remove(claimed_path)
+    except Exception as e:
+        # The next cycle finds it again, sees the spool copy and only removes it
+        logger.warning(f"Failed to delete claimed SMB file {claimed_path}: {e}")
+    return spool_path
+
+def _claim(events_file, spool_folder):
+    """Take events_file away from the exporter by moving it into the spool.
+
+    A local file is renamed into the spool. An SMB file is first renamed to
+    its claim name on the share, so the exporter starts a new file and
+    nothing it writes afterwards can be lost, and then copied down and
+    removed. Returns the spool path, or None if there is no file to claim.
+    """
+    base_name = os.path.basename(events_file.replace('\\', '/'))
+    name = f"{base_name}.{time.time_ns()}"
+    os.makedirs(spool_folder, exist_ok=True)
+    if smb.is_smb_path(events_file):
+        claimed_path = _remote_sibling(events_file, name)
+        try:
+            smb.rename(events_file, claimed_path)
+        except FileNotFoundError:
+            return None
+        except PermissionError as e:
+            logger.info(f"{events_file} is in use ({e}), claiming it next cycle")
+            return None
+        logger.info(f"Claimed {events_file} as {claimed_path}")
+        return _fetch_claimed(claimed_path, spool_folder)
+    spool_path = os.path.join(spool_folder, name)
+    try:
+        os.replace(events_file, spool_path)
+    except FileNotFoundError:
+        return None
+    except OSError:
+        # Spool on another filesystem: copy, then delete the source
+        shutil.move(events_file, spool_path)
+    logger.info(f"Claimed {events_file} as {spool_path}")
+    return spool_path
+
+def _claimed_files(events_file, spool_folder):
+    """Return spool files claimed by an earlier cycle that never archived them, oldest first.
+
+    For an SMB events_file, files renamed to a claim name on the share but
+    not yet fetched are fetched first.
+    """
+    base_name = os.path.basename(events_file.replace('\\', '/'))
+    if smb.is_smb_path(events_file):
+        folder = events_file.replace('\\', '/').rsplit('/', 1)[0]
+        for name in smb.listdir(folder):
+            if name.startswith(base_name + '.') and name[len(base_name) + 1:].isdigit():
+                logger.info(f"Fetching {name} left claimed on the share")
+                _fetch_claimed(_remote_sibling(events_file, name), spool_folder)
+    claimed = []
+    if not os.path.isdir(spool_folder):
+        return claimed
+    for entry in os.scandir(spool_folder):
+        if not entry.name.startswith(base_name + '.'):
+            continue
+        stamp = entry.name[len(base_name) + 1:]
+        if stamp.endswith('.part'):
+            # Interrupted SMB fetch; the claimed file is still on the share. Only
+            # cycles fetch into the spool and they hold the cycle lock, so
+            # no other process is still writing it
+            os.remove(entry.path)
+        elif stamp.isdigit():
+            claimed.append((int(stamp), entry.path))
+    return [path for _, path in sorted(claimed)]
+
+@contextmanager
+def _cycle_lock(spool_folder):
+    """Hold an exclusive lock on the spool for one ingest cycle.
+
+    The processor and the web "Pobierz dane" job both run cycles; a second
+    one waits here until the first has claimed, ingested and archived.
+    """
+    os.makedirs(spool_folder, exist_ok=True)
+    with open(os.path.join(spool_folder, LOCK_NAME), 'a+b') as f:
+        if os.name == 'nt':
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after about 10 seconds
+                    continue
+            unlock = partial(msvcrt.locking, f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            unlock = partial(fcntl.flock, f.fileno(), fcntl.LOCK_UN)
+        try:
+            yield
+        finally:
+            f.seek(0)
+            unlock()
+
+def file_checksum(path):
+    """Return the SHA-256 hex digest of a local file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(events.CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _ingest_claimed(spool_path, base_name, archive_folder, event_ids):
+    """Insert a claimed file unless its checksum is journaled, then archive it"""
+    checksum = file_checksum(spool_path)
+    if database.is_processed(checksum):
+        logger.info(f"{spool_path} was already ingested (sha256 {checksum[:12]}), archiving only")
+        inserted = 0
+    else:
+        logger.info(f"Reading events from {spool_path}")
+        inserted = database.insert_events_for_file(
+            events.iter_events(spool_path, event_ids, require_rows=False),
+            checksum, base_name, os.path.getsize(spool_path))
+        logger.info(f"Inserted {inserted} events into database")
+    files.archive_local(spool_path, base_name, archive_folder)
+    return inserted
+
+def process_file(events_file, archive_folder, event_ids):
+    """Ingest the whole events file and archive it as a journaled, restartable cycle.
+
+    1. Claim: the file is moved into the spool folder (an SMB file is renamed
+       on the share, then copied down once and removed).
+    2. Ingest: its events and its SHA-256 go into processed_files in one
+       transaction.
+    3. Archive: the spool file is moved into the archive.
+    A crash at any point leaves the file in the spool; the next cycle picks it
+    up first and, if step 2 had committed, only archives it.
+    """
+    # Ensure archive folder exists
+    files.ensure_archive_folder(archive_folder)
+
+    # Initialize database
+    logger.info("Initializing database")
+    database.init_db()
+
+    spool_folder = files.get_setting("spool_folder", "spool")
+    base_name = os.path.basename(events_file.replace('\\', '/'))
+    pending = _claimed_files(events_file, spool_folder)
+    if pending:
+        logger.info(f"Resuming {len(pending)} file(s) claimed by an interrupted cycle")
+    claimed = _claim(events_file, spool_folder)
+    if claimed:
+        pending.append(claimed)
+    else:
+        logger.info(f"{events_file} does not exist, nothing to claim")
+
+    inserted = 0
+    for spool_path in pending:
+        inserted += _ingest_claimed(spool_path, base_name, archive_folder, event_ids)
+    return inserted
+
+def _same_start(events_file, checkpoint):
+    """Return True if events_file still starts with the bytes the checkpoint was taken on"""
+    offset, fingerprint = checkpoint[2], checkpoint[4]
+    if fingerprint is None:
+        # Checkpoint written before fingerprints were stored
+        return True
+    return events.EventProcessor.fingerprint(events_file, min(offset, events.FINGERPRINT_SIZE)) == fingerprint
+
+def process_increment(events_file, event_ids):
+    """Insert only the lines appended to events_file since the last checkpoint.
+
+    The file stays in place. The checkpoint remembers the inode, size and byte
+    offset consumed so far and a hash of the first bytes of the file. If the
+    inode or that hash changes, or the file shrinks below the offset, it was
+    rotated or truncated and is read again from the start.
+    """
+    database.init_db()
+    try:
+        inode, size = events.EventProcessor.stat(events_file)
+    except FileNotFoundError:
+        logger.debug(f"{events_file} does not exist yet")
+        return 0
+    checkpoint = database.get_checkpoint(events_file)
+    if checkpoint and checkpoint[0] == inode and checkpoint[2] <= size and _same_start(events_file, checkpoint):
+        offset, encoding = checkpoint[2], checkpoint[3]
+    else:
+        if checkpoint:
+            logger.info(f"{events_file} was rotated or truncated, reading from the start")
+        offset, encoding = 0, None
+
+    end = events.EventProcessor.complete_lines_end(events_file, offset, size)
+    if end == offset:
+        logger.debug(f"No new lines in {events_file}")
+        return 0
+
+    if encoding is None:
+        # Sniffed again on every read until non-ASCII text shows which encoding
+        # the names are in; only then is it stored with the checkpoint
+        encoding, settled = events.EventProcessor.detect_range_encoding(events_file, offset, end)
+        logger.info(f"Detected {encoding} encoding" + ("" if settled else " (ASCII so far)"))
+        stored_encoding = encoding if settled else None
+    else:
+        stored_encoding = encoding
+
+    logger.info(f"Reading {events_file} bytes {offset}-{end}")
+    new_events = events.EventProcessor.iter_appended(events_file, offset, end, encoding, event_ids)
+    fingerprint = events.EventProcessor.fingerprint(events_file, min(end, events.FINGERPRINT_SIZE))
+    inserted = database.insert_events_with_checkpoint(new_events, events_file, inode, size, end, stored_encoding, fingerprint)
+    logger.info(f"Inserted {inserted} new events into database")
+    return inserted
+
+def run_cycle(events_file, archive_folder, event_ids, incremental=False):
+    """Run one ingest cycle; cycles in other threads or processes wait for it"""
+    with _cycle_lock(files.get_setting("spool_folder", "spool")):
+        if incremental:
+            return process_increment(events_file, event_ids)
+        return process_file(events_file, archive_folder, event_ids)
@@ -0,0 +1,93 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+
+
+class QueueFull(Exception):
+    """Raised when too many jobs are already queued or running"""
+
+
+class Job:
+    def __init__(self, key, description):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.description = description
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+
+    @property
+    def active(self):
+        return self.status in ('queued', 'running')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'description': self.description,
+            'status': self.status,
+            'error': self.error,
+            'created': self.created,
+            'finished': self.finished,
+        }
+
+
+class JobQueue:
+    """In-process background jobs run on a small thread pool.
+
+    At most max_pending jobs may be queued or running at once; submitting
+    more raises QueueFull. Submitting a key that already has an active job
+    returns that job instead of starting a duplicate. Finished jobs are kept
+    for the status endpoint until there are more than keep_finished of them.
+    """
+
+    def __init__(self, max_workers=2, max_pending=20, keep_finished=200):
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, description, func, *args, **kwargs):
+        with self._lock:
+            for job in self._jobs.values():
+                if job.key == key and job.active:
+                    logger.debug(f"Job for {key} already {job.status}: {job.id}")
+                    return job
+            if sum(1 for job in self._jobs.values() if job.active) >= self.max_pending:
+                raise QueueFull(f"{self.max_pending} jobs already pending")
+            job = Job(key, description)
+            self._jobs[job.id] = job
+            self._prune()
+        logger.info(f"Queued job {job.id}: {description}")
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, func, args, kwargs):
+        job.status = 'running'
+        try:
+            job.result = func(*args, **kwargs)
+            job.status = 'done'
+            logger.info(f"Job {job.id} done: {job.description}")
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'failed'
+            logger.error(f"Job {job.id} failed: {e}")
+            logger.exception("Full traceback:")
+        finally:
+            job.finished = time.time()
+
+    def _prune(self):
+        finished = [job for job in self._jobs.values() if not job.active]
+        if len(finished) <= self.keep_finished:
+            return
+        finished.sort(key=lambda job: job.finished)
+        for job in finished[:len(finished) - self.keep_finished]:
+            del self._jobs[job.id]
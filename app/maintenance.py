@@ -0,0 +1,34 @@
+import argparse
+import os
+from . import backfill
+from . import database
+from . import files
+from loguru import logger
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m app.maintenance', description="MINI RCP database maintenance")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('rebuild-attendance', help="recompute the daily attendance summary from all events")
+    backfill_parser = commands.add_parser('backfill', help="ingest every archived events file, parsing in parallel")
+    backfill_parser.add_argument('--folder', help="folder with the rotated files (default: archive_folder from config.json)")
+    backfill_parser.add_argument('--workers', type=int, help="parser processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    database.init_db()
+    if args.command == 'rebuild-attendance':
+        rows = database.rebuild_daily_attendance()
+        print(f"Rebuilt {rows} daily attendance rows")
+    elif args.command == 'backfill':
+        _, _, event_ids, events_file, archive_folder, _ = files.load_config()
+        base_name = os.path.basename(events_file.replace('\\', '/'))
+        paths = [path for _, path in files.archived_files(base_name, args.folder or archive_folder)]
+        done, inserted = backfill.backfill(paths, event_ids, args.workers, progress=_print_progress)
+        print(f"Inserted {inserted} events from {done} files")
+
+def _print_progress(done, total, path, inserted, rate):
+    print(f"[{done}/{total}] {os.path.basename(path)}: {inserted} new events, {rate:.0f} rows/s", flush=True)
+
+if __name__ == '__main__':
+    logger.add("logs/maintenance.log", rotation="10 MB", retention="1 week")
+    main()
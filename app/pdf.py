@@ -1,12 +1,14 @@
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, LongTable, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.fonts import addMapping
+import hashlib
 import io
+import json
 import os
 from datetime import datetime
 import platform
@@ -70,20 +72,38 @@ except Exception as e:
     FONT_NAME = 'Helvetica'
     FONT_BOLD = 'Helvetica-Bold'
 
-def generate_daily_pdf(date, time_spent):
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    
-    # Create custom styles with Polish font support
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=getSampleStyleSheet()['Title'],
-        fontName=FONT_BOLD,
-        fontSize=18,
-    )
-    
-    elements = []
-    
+# Built once and shared by every render
+_TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=getSampleStyleSheet()['Title'],
+    fontName=FONT_BOLD,
+    fontSize=18,
+)
+
+_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), FONT_BOLD),
+    ('FONTSIZE', (0, 0), (-1, 0), 14),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('FONTNAME', (0, 1), (-1, -1), FONT_NAME),
+    ('FONTSIZE', (0, 1), (-1, -1), 12),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+# Explicit column widths and row heights spare reportlab sizing every cell;
+# columns grow past these minimums to fit the longest value (see _column_widths)
+_MIN_COLUMN_WIDTHS = [1.8*inch, 2.2*inch, 2.5*inch]
+_CELL_PADDING = 12   # default 6pt left + 6pt right
+_HEADER_HEIGHT = 32  # 14pt font + 12pt bottom padding
+_ROW_HEIGHT = 18     # 12pt font + default padding
+
+# Bump when the layout changes so cached PDFs are not reused
+RENDER_VERSION = 2
+
+def daily_title(date):
     # Format date as DD/MM/YYYY
     try:
         date_obj = datetime.strptime(date, '%Y-%m-%d')
@@ -91,83 +111,90 @@ def generate_daily_pdf(date, time_spent):
     except ValueError:
         # If date is already in a different format, use as-is
         formatted_date = date
-    
-    # Title
-    title = Paragraph(f"Raport dzienny dla {formatted_date}", title_style)
-    elements.append(title)
-    elements.append(Spacer(1, 0.5*inch))
-    
-    # Table data
-    data = [['Imię', 'Nazwisko', 'Spędzony czas']]
-    for name, surname, mins in time_spent:
-        hours = int(mins // 60)
-        minutes = int(mins % 60)
-        time_str = f"{hours} godziny {minutes} minut"
-        data.append([name, surname, time_str])
-    
-    # Create table
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), FONT_BOLD),
-        ('FONTSIZE', (0, 0), (-1, 0), 14),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('FONTNAME', (0, 1), (-1, -1), FONT_NAME),
-        ('FONTSIZE', (0, 1), (-1, -1), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    elements.append(table)
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
+    return f"Raport dzienny dla {formatted_date}"
 
-def generate_monthly_pdf(year, month, monthly_time):
+def monthly_title(year, month):
+    return f"Raport miesięczny dla {year}-{month:02d}"
+
+def _column_widths(data):
+    """Return the width of each column of data, measured once from its widest cell"""
+    header, rows = data[0], data[1:]
+    widths = []
+    for column, min_width in enumerate(_MIN_COLUMN_WIDTHS):
+        widest = pdfmetrics.stringWidth(header[column], FONT_BOLD, 14)
+        # Durations and surnames repeat; measure each distinct value once
+        for value in {row[column] for row in rows}:
+            widest = max(widest, pdfmetrics.stringWidth(value, FONT_NAME, 12))
+        widths.append(max(min_width, widest + _CELL_PADDING))
+    return widths
+
+def render_report(title, time_spent):
+    """Render a titled table of (name, surname, minutes) rows and return a PDF buffer"""
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=letter)
-    
-    # Create custom styles with Polish font support
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=getSampleStyleSheet()['Title'],
-        fontName=FONT_BOLD,
-        fontSize=18,
-    )
-    
+
     elements = []
-    
+
     # Title
-    title = Paragraph(f"Raport miesięczny dla {year}-{month:02d}", title_style)
-    elements.append(title)
+    elements.append(Paragraph(title, _TITLE_STYLE))
     elements.append(Spacer(1, 0.5*inch))
-    
+
     # Table data
     data = [['Imię', 'Nazwisko', 'Spędzony czas']]
-    for name, surname, mins in monthly_time:
+    for name, surname, mins in time_spent:
         hours = int(mins // 60)
         minutes = int(mins % 60)
         time_str = f"{hours} godziny {minutes} minut"
         data.append([name, surname, time_str])
-    
-    # Create table
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), FONT_BOLD),
-        ('FONTSIZE', (0, 0), (-1, 0), 14),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('FONTNAME', (0, 1), (-1, -1), FONT_NAME),
-        ('FONTSIZE', (0, 1), (-1, -1), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
+
+    # LongTable splits across pages cheaply and repeats the header row
+    table = LongTable(data, colWidths=_column_widths(data),
+                      rowHeights=[_HEADER_HEIGHT] + [_ROW_HEIGHT] * (len(data) - 1), repeatRows=1)
+    table.setStyle(_TABLE_STYLE)
+
     elements.append(table)
     doc.build(elements)
     buffer.seek(0)
     return buffer
+
+def report_etag(title, time_spent):
+    """Return a hash identifying the PDF that render_report would produce"""
+    content = json.dumps([RENDER_VERSION, FONT_NAME, title, [list(row) for row in time_spent]], ensure_ascii=False)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def report_path(etag, cache_folder):
+    """Return where the report with this etag is cached, whether or not it exists yet"""
+    return os.path.join(cache_folder, f"{etag}.pdf")
+
+def cached_report_path(title, time_spent, cache_folder, max_files=500):
+    """Return the path of the rendered report in cache_folder, rendering it if needed"""
+    etag = report_etag(title, time_spent)
+    path = report_path(etag, cache_folder)
+    if os.path.exists(path):
+        return path
+    os.makedirs(cache_folder, exist_ok=True)
+    buffer = render_report(title, time_spent)
+    # Write then rename so concurrent readers never see a partial file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(buffer.getbuffer())
+    os.replace(tmp_path, path)
+    _prune_cache(cache_folder, max_files)
+    return path
+
+def _prune_cache(cache_folder, max_files):
+    cached = [entry for entry in os.scandir(cache_folder) if entry.name.endswith('.pdf')]
+    if len(cached) <= max_files:
+        return
+    cached.sort(key=lambda entry: entry.stat().st_mtime)
+    for entry in cached[:len(cached) - max_files]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+def generate_daily_pdf(date, time_spent):
+    return render_report(daily_title(date), time_spent)
+
+def generate_monthly_pdf(year, month, monthly_time):
+    return render_report(monthly_title(year, month), monthly_time)
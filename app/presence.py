@@ -0,0 +1,59 @@
+import threading
+from datetime import date
+from loguru import logger
+from . import database
+
+
+class PresenceIndex:
+    """Who is on site today, kept in memory for the web service.
+
+    The index is seeded once from today's events and afterwards only reads
+    events with ids above the last one it has seen, and only when PRAGMA
+    data_version shows that another connection committed something. A request
+    with no new data costs one pragma call and a sort of the people on site.
+    """
+
+    def __init__(self, in_event_ids):
+        self.in_event_ids = frozenset(in_event_ids)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._day = None
+        self._last_id = 0
+        self._data_version = None
+        self._latest = {}    # person_id -> (ts, id_point) of their latest event today
+        self._on_site = {}   # person_id -> (name, surname)
+
+    def users_on_site(self):
+        """Return sorted (name, surname) of people whose latest event today is an IN"""
+        with self._lock:
+            self._refresh()
+            return sorted(self._on_site.values())
+
+    def _refresh(self):
+        if self._conn is None:
+            self._conn = database.open_connection(check_same_thread=False)
+        today = date.today().isoformat()
+        version = database.get_data_version(self._conn)
+        if today == self._day and version == self._data_version:
+            return
+        if today != self._day:
+            logger.info(f"Seeding presence index for {today}")
+            self._day = today
+            self._last_id = 0
+            self._latest.clear()
+            self._on_site.clear()
+        self._data_version = version
+        self._last_id, rows = database.get_events_after(self._conn, self._last_id, today)
+        self._apply(rows)
+        logger.debug(f"Presence index applied {len(rows)} events, {len(self._on_site)} on site")
+
+    def _apply(self, rows):
+        for person_id, name, surname, ts, id_point in rows:
+            latest = self._latest.get(person_id)
+            if latest is not None and ts < latest[0]:
+                continue
+            self._latest[person_id] = (ts, id_point)
+            if id_point in self.in_event_ids:
+                self._on_site[person_id] = (name, surname)
+            else:
+                self._on_site.pop(person_id, None)
@@ -1,8 +1,6 @@
-from . import events
-from . import database
-import os
+from . import ingest
 from . import files
-import time
+from . import watch
 from loguru import logger
 
 logger.add("logs/processor.log", rotation="10 MB", retention="1 week")
@@ -13,40 +11,38 @@ def main():
     # Load configuration
     logger.info("Loading configuration")
     in_event_ids, out_event_ids, event_ids, events_file, archive_folder, processing_interval_minutes = files.load_config()
-    logger.info(f"Configuration loaded: events_file={events_file}, interval={processing_interval_minutes} minutes")
+    incremental = files.get_setting("incremental", False)
+    if incremental:
+        sleep_seconds = files.get_setting("incremental_interval_seconds", 30)
+        # Incremental reads stop at the last complete line, so no need to wait for writes to finish
+        debounce_seconds = 0
+    else:
+        sleep_seconds = processing_interval_minutes * 60
+        debounce_seconds = files.get_setting("watch_debounce_seconds", 5)
+    poll_seconds = files.get_setting("watch_poll_seconds", 10)
+    logger.info(f"Configuration loaded: events_file={events_file}, interval={sleep_seconds} seconds, incremental={incremental}")
 
     while True:
+        # Taken before the cycle so that lines appended or a new file written
+        # while it runs count as a change
+        signature = watch.file_signature(events_file)
         try:
             logger.info("Starting event processing cycle")
-
-            # Ensure archive folder exists
-            files.ensure_archive_folder(archive_folder)
-
-            # Initialize database
-            logger.info("Initializing database")
-            database.init_db()
-
-            # Read and process events
-            logger.info(f"Reading events from {events_file}")
-            event_list = events.read_events(events_file, event_ids)
-            logger.info(f"Loaded {len(event_list)} events")
-
-            for event in event_list:
-                database.insert_event(event)
-            logger.info("Inserted events into database")
-
-            # Archive the processed events file
-            logger.info(f"Archiving {events_file} to {archive_folder}")
-            files.archive_file(events_file, archive_folder)
+            ingest.run_cycle(events_file, archive_folder, event_ids, incremental=incremental)
             logger.info("Event processing cycle completed")
 
         except Exception as e:
             logger.error(f"Error in processing cycle: {e}")
             logger.exception("Full traceback:")
 
-        # Wait for next cycle
-        logger.info(f"Sleeping for {processing_interval_minutes} minutes")
-        time.sleep(processing_interval_minutes * 60)
+        if not incremental and watch.file_signature(events_file) != signature:
+            # The cycle claimed the file; whatever is there now is new work
+            signature = None
+
+        # Wait until the events file changes, at most one interval
+        logger.info(f"Waiting up to {sleep_seconds} seconds for changes to {events_file}")
+        watch.wait_for_change(events_file, sleep_seconds, since=signature,
+                              debounce_seconds=debounce_seconds, poll_interval=poll_seconds)
 
 if __name__ == '__main__':
     main()
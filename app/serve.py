@@ -0,0 +1,28 @@
+from . import files
+from .web import app
+from loguru import logger
+
+
+def main():
+    """Serve the web app with waitress, a multi-threaded production WSGI server.
+
+    The web app keeps per-process state (job queue, presence index, report
+    cache), so it runs as one process with a pool of worker threads rather
+    than several processes.
+    """
+    from waitress import serve
+
+    host = files.get_setting("web_host", "0.0.0.0")
+    port = files.get_setting("web_port", 5000)
+    threads = files.get_setting("web_threads", 8)
+    connection_limit = files.get_setting("web_connection_limit", 100)
+    # Idle keep-alive connections are closed after this many seconds
+    channel_timeout = files.get_setting("web_channel_timeout", 30)
+
+    logger.info(f"Starting MINI RCP Web Server on {host}:{port} with {threads} threads")
+    serve(app, host=host, port=port, threads=threads, connection_limit=connection_limit,
+          channel_timeout=channel_timeout, ident="mini-rcp")
+
+if __name__ == '__main__':
+    logger.add("logs/web.log", rotation="10 MB", retention="1 week")
+    main()
@@ -0,0 +1,99 @@
+import os
+import shutil
+import threading
+from loguru import logger
+
+# Bytes copied per read when spooling a remote file
+COPY_CHUNK_SIZE = 1024 * 1024
+
+_lock = threading.Lock()
+_configured = False
+_sessions = set()
+
+
+def is_smb_path(path):
+    return path.startswith('\\\\') or path.startswith('//')
+
+def split_path(smb_path):
+    """Return (server, share, path inside the share) for \\\\server\\share\\... or //server/share/..."""
+    parts = smb_path.replace('\\', '/').lstrip('/').split('/')
+    return parts[0], parts[1], '/'.join(parts[2:])
+
+def to_url(smb_path):
+    """Return the UNC path smbclient expects for an SMB location"""
+    server, share, file_path = split_path(smb_path)
+    file_path_windows = file_path.replace('/', '\\')
+    return f"\\\\{server}\\{share}\\{file_path_windows}"
+
+def _client(server):
+    """Return smbclient with integrated auth configured and a session to server registered.
+
+    smbclient keeps registered sessions in a process-wide pool, so the
+    configuration and the session setup happen once per process and server
+    instead of on every file operation.
+    """
+    global _configured
+    import smbclient
+    with _lock:
+        if not _configured:
+            # Use the current Windows user's credentials
+            smbclient.ClientConfig(username=None, password=None)
+            _configured = True
+        if server not in _sessions:
+            logger.info(f"Opening SMB session to {server}")
+            smbclient.register_session(server)
+            _sessions.add(server)
+    return smbclient
+
+def reset():
+    """Drop pooled SMB sessions, e.g. after the server closed them"""
+    import smbclient
+    with _lock:
+        smbclient.reset_connection_cache(fail_on_error=False)
+        _sessions.clear()
+
+def _call(smb_path, operation):
+    """Run operation(smbclient, url), reconnecting once if the pooled session went stale"""
+    server = split_path(smb_path)[0]
+    url = to_url(smb_path)
+    try:
+        return operation(_client(server), url)
+    except (FileNotFoundError, PermissionError):
+        raise
+    except OSError as e:
+        logger.warning(f"SMB operation on {smb_path} failed ({e}), reconnecting")
+        reset()
+        return operation(_client(server), url)
+
+def open_file(smb_path, mode='rb'):
+    return _call(smb_path, lambda client, url: client.open_file(url, mode=mode))
+
+def stat(smb_path):
+    return _call(smb_path, lambda client, url: client.stat(url))
+
+def remove(smb_path):
+    return _call(smb_path, lambda client, url: client.remove(url))
+
+def rename(smb_path, new_smb_path):
+    """Rename a remote file; the server does this atomically within a share"""
+    return _call(smb_path, lambda client, url: client.rename(url, to_url(new_smb_path)))
+
+def listdir(smb_path):
+    """Return the names of the entries in a remote folder"""
+    return _call(smb_path, lambda client, url: client.listdir(url))
+
+def fetch_to_spool(smb_path, spool_folder, name=None):
+    """Copy a remote file into spool_folder in one pass and return the local path.
+
+    name defaults to the path inside the share. The copy is written under a
+    temporary .part name and renamed when complete, so a spool file is never
+    half-written.
+    """
+    os.makedirs(spool_folder, exist_ok=True)
+    local_path = os.path.join(spool_folder, name or split_path(smb_path)[2].replace('/', '_'))
+    partial_path = local_path + '.part'
+    with open_file(smb_path, 'rb') as src, open(partial_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+    os.replace(partial_path, local_path)
+    logger.info(f"Fetched {smb_path} to {local_path} ({os.path.getsize(local_path)} bytes)")
+    return local_path
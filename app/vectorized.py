@@ -0,0 +1,49 @@
+from itertools import chain
+from loguru import logger
+
+
+def load_events(conn, start, end):
+    """Return a DataFrame of person_id, ts, id_point for events with start <= ts < end"""
+    import numpy as np
+    import pandas as pd
+
+    cursor = conn.execute('SELECT person_id, ts, COALESCE(id_point, -1) FROM events WHERE ts >= ? AND ts < ?', (start, end))
+    # Stream the rows straight into one int64 buffer instead of a list of tuples
+    columns = np.fromiter(chain.from_iterable(cursor), dtype=np.int64).reshape(-1, 3)
+    return pd.DataFrame(columns, columns=['person_id', 'ts', 'id_point'])
+
+def person_days(frame, in_event_ids, out_event_ids, out_excludes_in=False):
+    """Reduce events to first IN and last OUT timestamp per (person_id, day).
+
+    With out_excludes_in, an id listed as both IN and OUT counts as IN only.
+    Missing values are NaN.
+    """
+    is_in = frame['id_point'].isin(list(in_event_ids))
+    is_out = frame['id_point'].isin(list(out_event_ids))
+    if out_excludes_in:
+        is_out &= ~is_in
+    grouped = frame.assign(
+        day=frame['ts'] // 86400,
+        first_in=frame['ts'].where(is_in),
+        last_out=frame['ts'].where(is_out),
+    ).groupby(['person_id', 'day'], sort=False)
+    return grouped.agg(first_in=('first_in', 'min'), last_out=('last_out', 'max'))
+
+def time_spent(conn, start, end, in_event_ids, out_event_ids, out_excludes_in=False):
+    """Return (name, surname, minutes) from each person's earliest IN to latest OUT in [start, end).
+
+    Works from raw events rather than the daily_attendance summary and gives
+    the same results as the SQL engine in database.py.
+    """
+    frame = load_events(conn, start, end)
+    logger.debug(f"Loaded {len(frame)} events into the vectorized engine")
+    days = person_days(frame, in_event_ids, out_event_ids, out_excludes_in)
+    people = days.groupby(level='person_id').agg(first_in=('first_in', 'min'), last_out=('last_out', 'max'))
+    people = people[people['last_out'] > people['first_in']]
+    minutes = (people['last_out'] - people['first_in']) / 60.0
+
+    names = {person_id: (name, surname) for person_id, name, surname in
+             conn.execute('SELECT id, name, surname FROM people')}
+    result = [(*names[person_id], float(mins)) for person_id, mins in minutes.items()]
+    result.sort(key=lambda row: (row[0], row[1]))
+    return result
@@ -0,0 +1,117 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from loguru import logger
+from . import smb
+
+# inotify event masks from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def file_signature(path):
+    """Return (mtime_ns, size) of path, or None if it cannot be stat-ed"""
+    try:
+        if smb.is_smb_path(path):
+            st = smb.stat(path)
+        else:
+            st = os.stat(path)
+    except OSError:
+        # Missing, or the share is unreachable right now
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class _Inotify:
+    """Minimal inotify watch on the directory containing one file (Linux only)"""
+
+    def __init__(self, path):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.name = os.path.basename(path).encode()
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        directory = os.path.dirname(os.path.abspath(path))
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(self.fd, directory.encode(), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    def wait(self, timeout):
+        """Return True once an event for the watched file arrives, False on timeout"""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            readable, _, _ = select.select([self.fd], [], [], remaining)
+            if not readable:
+                return False
+            data = os.read(self.fd, 64 * 1024)
+            pos = 0
+            while pos < len(data):
+                _, _, _, length = _EVENT_HEADER.unpack_from(data, pos)
+                pos += _EVENT_HEADER.size
+                name = data[pos:pos + length].rstrip(b'\0')
+                pos += length
+                if name == self.name:
+                    return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _open_watch(path):
+    if not sys.platform.startswith('linux') or smb.is_smb_path(path):
+        return None
+    try:
+        return _Inotify(path)
+    except OSError as e:
+        logger.warning(f"inotify unavailable for {path}, falling back to polling: {e}")
+        return None
+
+
+def wait_for_change(path, timeout, since=None, debounce_seconds=5, poll_interval=10):
+    """Block until path differs from the since signature and has settled, or timeout.
+
+    Local files on Linux are watched with inotify; SMB paths and other
+    platforms are polled every poll_interval seconds. After a change, the file
+    must keep the same size and mtime for debounce_seconds so that a file that
+    is still being written is not consumed half way. Returns True if a change
+    was seen and False if timeout seconds passed without one.
+    """
+    deadline = time.monotonic() + timeout
+    watch = _open_watch(path)
+    try:
+        changed = file_signature(path) != since
+        while not changed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if watch:
+                watch.wait(remaining)
+            else:
+                time.sleep(min(poll_interval, remaining))
+            changed = file_signature(path) != since
+    finally:
+        if watch:
+            watch.close()
+
+    logger.info(f"Change detected on {path}, waiting for it to settle")
+    signature = file_signature(path)
+    stable_since = time.monotonic()
+    while time.monotonic() - stable_since < debounce_seconds:
+        time.sleep(min(1, debounce_seconds))
+        current = file_signature(path)
+        if current != signature:
+            signature = current
+            stable_since = time.monotonic()
+    return True
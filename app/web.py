@@ -1,15 +1,30 @@
 from . import database
 from . import files
-from flask import Flask, request, send_file, redirect, url_for, flash
+from flask import Flask, Response, request, send_file, redirect, url_for, flash, jsonify, stream_with_context
 from loguru import logger
 from . import pdf
-from . import events
+from . import ingest
+from . import jobs
+from .presence import PresenceIndex
 from datetime import datetime
+from markupsafe import escape
+import csv
+import io
+import os
 
 # Load configuration for web
 in_event_ids, out_event_ids, event_ids, events_file, archive_folder, processing_interval_minutes = files.load_config()
+pdf_cache_folder = os.path.abspath(files.get_setting("pdf_cache_folder", "pdf_cache"))
+# Template output pieces buffered per chunk of a streamed page (a report row is ~7 pieces)
+STREAM_BUFFER = 512
+CSV_CHUNK_BYTES = 64 * 1024
+API_PAGE_SIZE = 1000
+API_MAX_PAGE_SIZE = 10000
 
 app = Flask(__name__)
+presence = PresenceIndex(in_event_ids)
+job_queue = jobs.JobQueue(max_workers=files.get_setting("job_workers", 2),
+                          max_pending=files.get_setting("job_max_pending", 20))
 
 @app.route('/')
 def index():
@@ -91,33 +106,25 @@ def index():
     </html>
     """
 
+def _duration(mins):
+    return f"{int(mins // 60)} godziny {int(mins % 60)} minut"
+
+app.jinja_env.filters['duration'] = _duration
+app.jinja_env.trim_blocks = True
+app.jinja_env.lstrip_blocks = True
+# Compile the streamed page templates once at startup instead of on first request
+for _template in ('base.html', 'users_on_site.html', 'report.html'):
+    app.jinja_env.get_template(_template)
+
+def _stream_page(template_name, **context):
+    """Stream a template as it renders, sending output in chunks of STREAM_BUFFER pieces"""
+    stream = app.jinja_env.get_template(template_name).stream(**context)
+    stream.enable_buffering(STREAM_BUFFER)
+    return Response(stream_with_context(stream), mimetype='text/html')
+
 @app.route('/users_on_site')
 def users_on_site():
-    users = database.get_users_on_site(in_event_ids, out_event_ids)
-    html = """
-    <!DOCTYPE html>
-    <html lang="pl">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Użytkownicy na miejscu</title>
-        <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
-    </head>
-    <body>
-        <div class="container mt-5">
-            <h1>Użytkownicy obecnie na miejscu</h1>
-            <ul class="list-group mb-3">
-    """
-    for name, surname in users:
-        html += f"<li class='list-group-item'>{name} {surname}</li>"
-    html += """
-            </ul>
-            <a href='/' class="btn btn-secondary">Powrót</a>
-        </div>
-    </body>
-    </html>
-    """
-    return html
+    return _stream_page('users_on_site.html', users=presence.users_on_site())
 
 @app.route('/day_report', methods=['POST'])
 def day_report():
@@ -133,131 +140,225 @@ def day_report():
         display_date = date_input
     
     time_spent = database.calculate_time_spent(date, in_event_ids, out_event_ids)
-    html = f"""
-    <!DOCTYPE html>
-    <html lang="pl">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Raport dzienny</title>
-        <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
-    </head>
-    <body>
-        <div class="container mt-5">
-            <h1>Raport dzienny dla {display_date}</h1>
-            <table class="table table-striped">
-                <thead>
-                    <tr>
-                        <th>Imię</th>
-                        <th>Nazwisko</th>
-                        <th>Spędzony czas</th>
-                    </tr>
-                </thead>
-                <tbody>
-    """
-    for name, surname, mins in time_spent:
-        hours = int(mins // 60)
-        minutes = int(mins % 60)
-        time_str = f"{hours} godziny {minutes} minut"
-        html += f"<tr><td>{name}</td><td>{surname}</td><td>{time_str}</td></tr>"
-    html += f"""
-                </tbody>
-            </table>
-            <a href='/' class="btn btn-secondary">Powrót</a>
-            <a href='/day_report_pdf/{date}' class="btn btn-primary ms-2">Pobierz PDF</a>
-        </div>
-    </body>
-    </html>
-    """
-    return html
+    return _stream_page('report.html', page_title="Raport dzienny", heading=f"Raport dzienny dla {display_date}",
+                        rows=time_spent, pdf_url=f"/day_report_pdf/{date}")
 
 @app.route('/monthly_report', methods=['POST'])
 def monthly_report():
     year = int(request.form['year'])
     month = int(request.form['month'])
     monthly_time = database.calculate_monthly_time_spent(year, month, in_event_ids, out_event_ids)
-    html = f"""
+    return _stream_page('report.html', page_title="Raport miesięczny", heading=f"Raport miesięczny dla {year}-{month:02d}",
+                        rows=monthly_time, pdf_url=f"/monthly_report_pdf/{year}/{month}")
+
+def _render_report_job(title, time_spent, download_name):
+    path = pdf.cached_report_path(title, time_spent, pdf_cache_folder)
+    return {'path': path, 'download_name': download_name}
+
+def _send_report_pdf(title, time_spent, download_name):
+    """Send a cached report PDF, 304 if the client has it, or queue its rendering"""
+    etag = pdf.report_etag(title, time_spent)
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers={'ETag': f'"{etag}"'})
+    path = pdf.report_path(etag, pdf_cache_folder)
+    if os.path.exists(path):
+        return send_file(path, as_attachment=True, download_name=download_name, mimetype='application/pdf', etag=etag)
+    try:
+        job = job_queue.submit(('pdf', etag), f"PDF {title}", _render_report_job, title, time_spent, download_name)
+    except jobs.QueueFull:
+        return Response("Zbyt wiele zadań w kolejce, spróbuj ponownie za chwilę", status=503, headers={'Retry-After': '10'})
+    return redirect(url_for('job_status', job_id=job.id))
+
+@app.route('/day_report_pdf/<date>')
+def day_report_pdf(date):
+    time_spent = database.calculate_time_spent(date, in_event_ids, out_event_ids)
+    return _send_report_pdf(pdf.daily_title(date), time_spent, f'raport_dzienny_{date}.pdf')
+
+@app.route('/monthly_report_pdf/<int:year>/<int:month>')
+def monthly_report_pdf(year, month):
+    monthly_time = database.calculate_monthly_time_spent(year, month, in_event_ids, out_event_ids)
+    return _send_report_pdf(pdf.monthly_title(year, month), monthly_time, f'raport_miesieczny_{year}_{month:02d}.pdf')
+
+@app.route('/stats/cache')
+def cache_stats():
+    return jsonify(database.report_cache_info())
+
+def _process_data_job():
+    logger.info("Manual data processing triggered from web interface")
+    inserted = ingest.run_cycle(events_file, archive_folder, event_ids, incremental=files.get_setting("incremental", False))
+    logger.info("Manual data processing completed")
+    return {'inserted': inserted}
+
+@app.route('/process_data')
+def process_data():
+    try:
+        job = job_queue.submit('process_data', "Pobieranie danych", _process_data_job)
+    except jobs.QueueFull:
+        return Response("Zbyt wiele zadań w kolejce, spróbuj ponownie za chwilę", status=503, headers={'Retry-After': '10'})
+    return redirect(url_for('job_status', job_id=job.id))
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return Response("Nie znaleziono zadania", status=404)
+    if request.args.get('format') == 'json' or request.accept_mimetypes.best == 'application/json':
+        return jsonify(job.to_dict())
+
+    if job.active:
+        refresh = '<meta http-equiv="refresh" content="2">'
+        body = '<div class="alert alert-info">Zadanie w toku, strona odświeży się automatycznie.</div>'
+    elif job.status == 'failed':
+        refresh = ''
+        body = f'<div class="alert alert-danger">Zadanie nie powiodło się: {escape(job.error)}</div>'
+    elif job.result and 'path' in job.result:
+        refresh = f'<meta http-equiv="refresh" content="0; url={url_for("job_download", job_id=job.id)}">'
+        body = f'<a href="{url_for("job_download", job_id=job.id)}" class="btn btn-primary">Pobierz PDF</a>'
+    else:
+        refresh = ''
+        body = f'<div class="alert alert-success">Zakończono, dodano {job.result["inserted"]} zdarzeń.</div>'
+    return f"""
     <!DOCTYPE html>
     <html lang="pl">
     <head>
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Raport miesięczny</title>
+        {refresh}
+        <title>Zadanie</title>
         <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
     </head>
     <body>
         <div class="container mt-5">
-            <h1>Raport miesięczny dla {year}-{month:02d}</h1>
-            <table class="table table-striped">
-                <thead>
-                    <tr>
-                        <th>Imię</th>
-                        <th>Nazwisko</th>
-                        <th>Spędzony czas</th>
-                    </tr>
-                </thead>
-                <tbody>
-    """
-    for name, surname, mins in monthly_time:
-        hours = int(mins // 60)
-        minutes = int(mins % 60)
-        time_str = f"{hours} godziny {minutes} minut"
-        html += f"<tr><td>{name}</td><td>{surname}</td><td>{time_str}</td></tr>"
-    html += f"""
-                </tbody>
-            </table>
+            <h1>{escape(job.description)}</h1>
+            {body}
             <a href='/' class="btn btn-secondary">Powrót</a>
-            <a href='/monthly_report_pdf/{year}/{month}' class="btn btn-primary ms-2">Pobierz PDF</a>
         </div>
     </body>
     </html>
     """
-    return html
 
-@app.route('/day_report_pdf/<date>')
-def day_report_pdf(date):
+@app.route('/jobs/<job_id>/download')
+def job_download(job_id):
+    job = job_queue.get(job_id)
+    if job is None or job.status != 'done' or not job.result or 'path' not in job.result:
+        return Response("Plik nie jest gotowy", status=404)
+    return send_file(job.result['path'], as_attachment=True, download_name=job.result['download_name'], mimetype='application/pdf')
+
+# Machine-readable API: ?format=json (default) or ?format=csv on every endpoint
+
+def _api_error(message, status=400):
+    return jsonify({'error': message}), status
+
+def _api_format():
+    fmt = request.args.get('format', 'json')
+    return fmt if fmt in ('json', 'csv') else None
+
+def _csv_response(header, rows, filename):
+    """Stream rows as CSV, flushing every CSV_CHUNK_BYTES so memory stays constant"""
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() >= CSV_CHUNK_BYTES:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    return Response(stream_with_context(generate()), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+def _time_spent_response(time_spent, filename, **meta):
+    if _api_format() == 'csv':
+        return _csv_response(('name', 'surname', 'minutes'), time_spent, filename)
+    return jsonify({**meta, 'rows': [{'name': name, 'surname': surname, 'minutes': mins}
+                                     for name, surname, mins in time_spent]})
+
+def _parse_cursor(value):
+    """Parse the 'ts:id' keyset cursor handed out as 'next' by /api/events"""
+    ts, event_id = value.split(':')
+    return int(ts), int(event_id)
+
+@app.route('/api/events')
+def api_events():
+    """Events in an inclusive from/to date range.
+
+    JSON returns one page of at most limit events plus a 'next' cursor to
+    pass as after=; CSV streams every event in the range after the cursor.
+    """
+    fmt = _api_format()
+    if fmt is None:
+        return _api_error("format must be json or csv")
+    start_date, end_date = request.args.get('from'), request.args.get('to')
+    try:
+        for value in (start_date, end_date):
+            if value:
+                datetime.strptime(value, '%Y-%m-%d')
+        after = _parse_cursor(request.args['after']) if request.args.get('after') else None
+        limit = min(int(request.args.get('limit', API_PAGE_SIZE)), API_MAX_PAGE_SIZE)
+    except ValueError:
+        return _api_error("invalid from, to, after or limit")
+    if limit < 1:
+        return _api_error("limit must be positive")
+
+    if fmt == 'csv':
+        rows = (row[2:] for row in database.iter_events_range(start_date, end_date, after))
+        return _csv_response(('date', 'time', 'name', 'surname', 'id_point'), rows,
+                             f"events_{start_date or 'start'}_{end_date or 'end'}.csv")
+
+    page = database.get_events_page(start_date, end_date, after, limit)
+    events = [{'id': event_id, 'date': date_str, 'time': time_str, 'name': name, 'surname': surname, 'id_point': id_point}
+              for event_id, ts, date_str, time_str, name, surname, id_point in page]
+    next_cursor = f"{page[-1][1]}:{page[-1][0]}" if len(page) == limit else None
+    return jsonify({'events': events, 'next': next_cursor})
+
+@app.route('/api/day_report/<date>')
+def api_day_report(date):
+    if _api_format() is None:
+        return _api_error("format must be json or csv")
+    try:
+        datetime.strptime(date, '%Y-%m-%d')
+    except ValueError:
+        return _api_error("date must be YYYY-MM-DD")
     time_spent = database.calculate_time_spent(date, in_event_ids, out_event_ids)
-    pdf_buffer = pdf.generate_daily_pdf(date, time_spent)
-    return send_file(pdf_buffer, as_attachment=True, download_name=f'raport_dzienny_{date}.pdf', mimetype='application/pdf')
+    return _time_spent_response(time_spent, f'raport_dzienny_{date}.csv', date=date)
 
-@app.route('/monthly_report_pdf/<int:year>/<int:month>')
-def monthly_report_pdf(year, month):
+@app.route('/api/monthly_report/<int:year>/<int:month>')
+def api_monthly_report(year, month):
+    if _api_format() is None:
+        return _api_error("format must be json or csv")
+    if not 1 <= month <= 12:
+        return _api_error("month must be between 1 and 12")
     monthly_time = database.calculate_monthly_time_spent(year, month, in_event_ids, out_event_ids)
-    pdf_buffer = pdf.generate_monthly_pdf(year, month, monthly_time)
-    return send_file(pdf_buffer, as_attachment=True, download_name=f'raport_miesieczny_{year}_{month:02d}.pdf', mimetype='application/pdf')
+    return _time_spent_response(monthly_time, f'raport_miesieczny_{year}_{month:02d}.csv', year=year, month=month)
 
-@app.route('/process_data')
-def process_data():
-    try:
-        logger.info("Manual data processing triggered from web interface")
-        
-        # Ensure archive folder exists
-        files.ensure_archive_folder(archive_folder)
-        
-        # Initialize database
-        database.init_db()
-        
-        # Read and process events
-        logger.info(f"Reading events from {events_file}")
-        event_list = events.read_events(events_file, event_ids)
-        logger.info(f"Loaded {len(event_list)} events")
-        
-        for event in event_list:
-            database.insert_event(event)
-        logger.info("Inserted events into database")
-        
-        # Archive the processed events file
-        logger.info(f"Archiving {events_file} to {archive_folder}")
-        files.archive_file(events_file, archive_folder)
-        logger.info("Manual data processing completed")
-        
-        # Redirect back to main page with success message
-        return redirect(url_for('index'))
-        
-    except Exception as e:
-        logger.error(f"Error in manual data processing: {e}")
-        # Redirect back to main page even on error
-        return redirect(url_for('index'))
+@app.route('/api/monthly_sessions/<int:year>/<int:month>')
+def api_monthly_sessions(year, month):
+    """Per-day session minutes and monthly totals per person"""
+    fmt = _api_format()
+    if fmt is None:
+        return _api_error("format must be json or csv")
+    if not 1 <= month <= 12:
+        return _api_error("month must be between 1 and 12")
+    sessions = database.calculate_monthly_sessions(year, month, in_event_ids, out_event_ids)
+    if fmt == 'csv':
+        rows = ((name, surname, day, mins) for name, surname, _, daily in sessions for day, mins in daily)
+        return _csv_response(('name', 'surname', 'date', 'minutes'), rows, f'sesje_{year}_{month:02d}.csv')
+    return jsonify({'year': year, 'month': month, 'rows': [
+        {'name': name, 'surname': surname, 'minutes': total,
+         'daily': [{'date': day, 'minutes': mins} for day, mins in daily]}
+        for name, surname, total, daily in sessions]})
+
+@app.route('/api/users_on_site')
+def api_users_on_site():
+    fmt = _api_format()
+    if fmt is None:
+        return _api_error("format must be json or csv")
+    users = presence.users_on_site()
+    if fmt == 'csv':
+        return _csv_response(('name', 'surname'), users, 'users_on_site.csv')
+    return jsonify({'users': [{'name': name, 'surname': surname} for name, surname in users]})
 
 if __name__ == '__main__':
     logger.add("logs/web.log", rotation="10 MB", retention="1 week")
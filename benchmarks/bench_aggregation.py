@@ -0,0 +1,77 @@
+"""Monthly first-IN to last-OUT span: SQL aggregation vs the previous per-row Python loop.
+
+Usage: python -m benchmarks.bench_aggregation [people] [events_per_day]
+"""
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from loguru import logger
+
+from app import database
+from benchmarks.synthetic import generate_rows
+
+IN_IDS = [1]
+OUT_IDS = [2]
+
+
+def python_loop(year, month, in_event_ids, out_event_ids):
+    """The Python implementation the SQL aggregation replaced"""
+    start, end = database._month_range(year, month)
+    cursor = database.get_connection().cursor()
+    cursor.execute('''
+        SELECT e.person_id, p.name, p.surname, e.ts, e.id_point
+        FROM events e JOIN people p ON p.id = e.person_id
+        WHERE e.ts >= ? AND e.ts < ?
+        ORDER BY e.ts
+    ''', (start, end))
+    person_events = defaultdict(list)
+    for person_id, name, surname, ts, id_point in cursor:
+        person_events[(person_id, name, surname)].append((ts, id_point))
+
+    monthly_time = []
+    for (_, name, surname), events in person_events.items():
+        earliest_in = None
+        latest_out = None
+        for ts, id_point in events:
+            if id_point in in_event_ids:
+                if earliest_in is None:
+                    earliest_in = ts
+            elif id_point in out_event_ids:
+                latest_out = ts
+        if earliest_in is not None and latest_out is not None and latest_out > earliest_in:
+            monthly_time.append((name, surname, (latest_out - earliest_in) / 60))
+    monthly_time.sort()
+    return monthly_time
+
+
+def timed(label, func):
+    started = time.perf_counter()
+    result = func()
+    print(f"{label:16} {(time.perf_counter() - started) * 1000:9.1f} ms  {len(result)} people")
+    return result
+
+
+def run(people, events_per_day):
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        database.configure(os.path.join(tmp, 'events.db'))
+        database.init_db()
+        rows = people * 30 * events_per_day
+        database.insert_events(generate_rows(rows, persons=people, id_points=(1, 2), days=30), batch_size=50_000)
+        print(f"{rows} events for {people} people in 2024-01")
+
+        loop = timed('python loop', lambda: python_loop(2024, 1, IN_IDS, OUT_IDS))
+        pushed = timed('sql aggregation', lambda: database._compute_monthly_time_spent(2024, 1, IN_IDS, OUT_IDS))
+        assert loop == pushed, "results differ"
+        database.close_connection()
+        os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    logger.remove()
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 4)
@@ -0,0 +1,61 @@
+"""Archive step cost vs archive size: directory scan + stat per file vs persisted counter.
+
+Also reports the disk space of a plain vs a gzip archived copy.
+
+Usage: python -m benchmarks.bench_archive [existing_files ...]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+from loguru import logger
+
+from app import database, files
+from benchmarks.synthetic import write_events_csv
+
+
+def legacy_next_path(base_name, archive_dir):
+    """The numbering used before the counter: newest file by mtime, plus one"""
+    matching = [f for f in os.listdir(archive_dir) if f.startswith(base_name + '.')]
+    if not matching:
+        return os.path.join(archive_dir, f"{base_name}.1")
+    last_file = max(matching, key=lambda f: os.path.getmtime(os.path.join(archive_dir, f)))
+    return os.path.join(archive_dir, f"{base_name}.{int(last_file.split('.')[-1]) + 1}")
+
+
+def run(sizes):
+    logger.remove()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        with open('config.json', 'w') as f:
+            json.dump({'archive_compression': 'gzip'}, f)
+        print(f"{'files':>7} {'scan ms':>8} {'counter ms':>10}")
+        for size in sizes:
+            archive = os.path.join(tmp, f"archive_{size}")
+            os.mkdir(archive)
+            for i in range(1, size + 1):
+                open(os.path.join(archive, f"PREvents.csv.{i}"), 'w').close()
+            database.configure(os.path.join(tmp, f"events_{size}.db"))
+            database.init_db()
+            files._archive_path('PREvents.csv', archive)  # first call seeds the counter
+
+            started = time.perf_counter()
+            legacy_next_path('PREvents.csv', archive)
+            scan = time.perf_counter() - started
+            started = time.perf_counter()
+            files._archive_path('PREvents.csv', archive)
+            counter = time.perf_counter() - started
+            database.close_connection()
+            print(f"{size:7d} {scan * 1000:8.1f} {counter * 1000:10.2f}")
+
+        source = write_events_csv(os.path.join(tmp, 'PREvents.csv'), 100000)
+        plain = os.path.getsize(source)
+        files._store(source, os.path.join(tmp, 'copy.gz'))
+        print(f"100k-row file: {plain / 1e6:.1f} MB plain, {os.path.getsize(os.path.join(tmp, 'copy.gz')) / 1e6:.1f} MB gzip")
+        os.chdir(os.path.dirname(tmp))
+
+
+if __name__ == '__main__':
+    run([int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000, 30000])
@@ -0,0 +1,43 @@
+"""Backfill throughput (rows/s) across parser process counts.
+
+Usage: python -m benchmarks.bench_backfill [files] [rows_per_file] [workers ...]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from loguru import logger
+
+from app import backfill, database, files
+from benchmarks.synthetic import write_events_csv
+
+EVENT_IDS = [1, 2, 7]
+
+
+def run(file_count, rows_per_file, worker_counts):
+    logger.remove()
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = os.path.join(tmp, 'archive')
+        os.mkdir(archive)
+        for i in range(1, file_count + 1):
+            write_events_csv(os.path.join(archive, f"PREvents.csv.{i}"), rows_per_file, seed=i)
+        paths = [path for _, path in files.archived_files('PREvents.csv', archive)]
+        total_rows = file_count * rows_per_file
+
+        print(f"{'workers':>7} {'seconds':>8} {'rows/s':>10}")
+        for workers in worker_counts:
+            database.configure(os.path.join(tmp, f"events_{workers}.db"))
+            started = time.perf_counter()
+            backfill.backfill(paths, EVENT_IDS, workers)
+            elapsed = time.perf_counter() - started
+            database.close_connection()
+            print(f"{workers:7d} {elapsed:8.2f} {total_rows / elapsed:10.0f}")
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    file_count = args[0] if args else 16
+    rows_per_file = args[1] if len(args) > 1 else 50000
+    cpus = os.cpu_count() or 1
+    run(file_count, rows_per_file, args[2:] or sorted({1, 2, 4, cpus}))
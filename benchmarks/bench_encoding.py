@@ -0,0 +1,102 @@
+"""Encoding detection + read: candidate loop over full re-reads vs one sniffed pass.
+
+Bytes read are counted, and a simulated remote link (--mbps) charges each
+byte as an SMB share would.
+
+Usage: python -m benchmarks.bench_encoding [rows] [--mbps N]
+"""
+import codecs
+import os
+import sys
+import tempfile
+import time
+
+from loguru import logger
+
+from app.events import CHUNK_SIZE, ENCODING_SAMPLE_SIZE, EventProcessor, _sniff_encoding
+from benchmarks.synthetic import write_events_csv
+
+
+class CountingFile:
+    """Binary file wrapper that counts bytes and sleeps as if they came over a link of mbps"""
+
+    def __init__(self, f, stats, mbps):
+        self._f = f
+        self._stats = stats
+        self._mbps = mbps
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        self._stats['bytes'] += len(data)
+        if self._mbps:
+            time.sleep(len(data) * 8 / (self._mbps * 1_000_000))
+        return data
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._f.close()
+
+
+def legacy_read(path, open_raw):
+    """The detection loop used before sniffing: decode the whole file per candidate, then read it again"""
+    for encoding in ['cp1250', 'utf-8', 'utf-16', 'cp1252', 'latin1']:
+        try:
+            with open_raw(path) as f:
+                decoder = codecs.getincrementaldecoder(encoding)()
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    decoder.decode(chunk)
+                decoder.decode(b'', final=True)
+            break
+        except UnicodeDecodeError:
+            continue
+    with open_raw(path) as f:
+        return f.read().decode(encoding)
+
+
+def measure(func, path, mbps):
+    stats = {'bytes': 0}
+    original = EventProcessor._open_raw
+
+    def open_raw(p, use_smb=False):
+        return CountingFile(original(p), stats, mbps)
+
+    EventProcessor._open_raw = staticmethod(open_raw)
+    try:
+        started = time.perf_counter()
+        content = func(path, open_raw)
+        return time.perf_counter() - started, stats['bytes'], content
+    finally:
+        EventProcessor._open_raw = staticmethod(original)
+
+
+def current_read(path, open_raw):
+    """Sniff the encoding from the leading bytes and decode the file from the same single read"""
+    with open_raw(path) as f:
+        data = f.read()
+    return data.decode(_sniff_encoding(data[:ENCODING_SAMPLE_SIZE], complete=len(data) <= ENCODING_SAMPLE_SIZE))
+
+
+def run(rows, mbps):
+    logger.remove()
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'encoding':>9} {'MB':>6} {'legacy s':>9} {'read MB':>8} {'current s':>10} {'read MB':>8}")
+        for encoding in ('cp1250', 'utf-8', 'utf-16'):
+            path = write_events_csv(os.path.join(tmp, f"{encoding}.csv"), rows, encoding=encoding)
+            size = os.path.getsize(path) / 1e6
+            legacy_s, legacy_bytes, legacy_text = measure(legacy_read, path, mbps)
+            current_s, current_bytes, current_text = measure(current_read, path, mbps)
+            same = "" if legacy_text == current_text else "  (legacy misdecoded)"
+            print(f"{encoding:>9} {size:6.1f} {legacy_s:9.2f} {legacy_bytes / 1e6:8.1f} "
+                  f"{current_s:10.2f} {current_bytes / 1e6:8.1f}{same}")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    mbps = 0
+    if '--mbps' in args:
+        i = args.index('--mbps')
+        mbps = float(args[i + 1])
+        del args[i:i + 2]
+    run(int(args[0]) if args else 1_000_000, mbps)
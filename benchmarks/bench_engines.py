@@ -0,0 +1,97 @@
+"""Twelve monthly reports: original strptime loop vs SQL engine vs vectorized engine.
+
+Usage: python -m benchmarks.bench_engines [people] [events_per_day]
+"""
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, datetime
+
+from loguru import logger
+
+from app import database, vectorized
+from benchmarks.synthetic import generate_rows
+
+IN_IDS = [1]
+OUT_IDS = [2]
+YEAR = 2024
+
+
+def fetch_strings(year, month):
+    """Month rows as the original schema stored them: name, surname, date and time strings"""
+    start, end = database._month_range(year, month)
+    cursor = database.get_connection().execute('''
+        SELECT p.name, p.surname, e.ts, e.id_point
+        FROM events e JOIN people p ON p.id = e.person_id
+        WHERE e.ts >= ? AND e.ts < ?
+        ORDER BY p.name, p.surname, e.ts
+    ''', (start, end))
+    return [(name, surname, *database._format_timestamp(ts)[::-1], id_point) for name, surname, ts, id_point in cursor]
+
+
+def strptime_loop(rows, in_event_ids, out_event_ids):
+    """The original calculate_monthly_time_spent body, minus its query"""
+    person_events = defaultdict(list)
+    for name, surname, date_str, time_str, id_point in rows:
+        person_events[(name, surname)].append((date_str, time_str, id_point))
+    monthly_time = []
+    for person, events in person_events.items():
+        earliest_in = None
+        latest_out = None
+        for date_str, time_str, id_point in events:
+            dt = datetime.strptime(f"{date_str} {time_str}", '%Y-%m-%d %H:%M:%S')
+            if id_point in in_event_ids:
+                if earliest_in is None or dt < earliest_in:
+                    earliest_in = dt
+            elif id_point in out_event_ids:
+                if latest_out is None or dt > latest_out:
+                    latest_out = dt
+        if earliest_in and latest_out and latest_out > earliest_in:
+            monthly_time.append((person[0], person[1], (latest_out - earliest_in).total_seconds() / 60))
+    return monthly_time
+
+
+def run(people, events_per_day):
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        database.configure(os.path.join(tmp, 'events.db'))
+        database.init_db()
+        days = 366
+        rows = people * days * events_per_day
+        database.insert_events(generate_rows(rows, persons=people, start=date(YEAR, 1, 1), id_points=(1, 2), days=days),
+                               batch_size=50_000)
+        print(f"{rows} events for {people} people over 12 months")
+
+        totals = {'strptime loop': 0.0, 'sql': 0.0, 'vectorized': 0.0}
+        conn = database.get_connection()
+        for month in range(1, 13):
+            start, end = database._month_range(YEAR, month)
+            strings = fetch_strings(YEAR, month)
+
+            started = time.perf_counter()
+            strptime_loop(strings, IN_IDS, OUT_IDS)
+            totals['strptime loop'] += time.perf_counter() - started
+
+            started = time.perf_counter()
+            by_sql = database._compute_monthly_time_spent(YEAR, month, IN_IDS, OUT_IDS)
+            totals['sql'] += time.perf_counter() - started
+
+            started = time.perf_counter()
+            by_frame = vectorized.time_spent(conn, start, end, IN_IDS, OUT_IDS, out_excludes_in=True)
+            totals['vectorized'] += time.perf_counter() - started
+            assert by_sql == by_frame, f"engines differ for month {month}"
+
+        base = totals['strptime loop']
+        for label, seconds in totals.items():
+            print(f"{label:14} {seconds:8.2f} s  {base / seconds:6.1f}x")
+        database.close_connection()
+        os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    logger.remove()
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 2)
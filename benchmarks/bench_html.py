@@ -0,0 +1,81 @@
+"""Report page render time per 1k rows: string concatenation vs streamed template.
+
+Reports total render time per 1k rows and time to the first chunk.
+
+Usage: python -m benchmarks.bench_html [rows ...]
+"""
+import os
+import sys
+import time
+
+from jinja2 import Environment, FileSystemLoader
+
+TEMPLATES = os.path.join(os.path.dirname(__file__), os.pardir, 'app', 'templates')
+STREAM_BUFFER = 512
+
+
+def legacy_render(rows):
+    """The html += loop the report views used before streaming"""
+    html = """
+    <!DOCTYPE html>
+    <html lang="pl">
+    <body>
+        <div class="container mt-5">
+            <h1>Raport dzienny</h1>
+            <table class="table table-striped">
+                <tbody>
+    """
+    for name, surname, mins in rows:
+        hours = int(mins // 60)
+        minutes = int(mins % 60)
+        time_str = f"{hours} godziny {minutes} minut"
+        html += f"<tr><td>{name}</td><td>{surname}</td><td>{time_str}</td></tr>"
+    html += """
+                </tbody>
+            </table>
+        </div>
+    </body>
+    </html>
+    """
+    yield html
+
+
+def make_env():
+    """An environment configured like the Flask app's"""
+    env = Environment(loader=FileSystemLoader(TEMPLATES), autoescape=True, trim_blocks=True, lstrip_blocks=True)
+    env.filters['duration'] = lambda mins: f"{int(mins // 60)} godziny {int(mins % 60)} minut"
+    return env
+
+
+def streamed_render(env, rows):
+    stream = env.get_template('report.html').stream(page_title="Raport dzienny", heading="Raport dzienny",
+                                                     rows=rows, pdf_url="/day_report_pdf/2025-01-01")
+    stream.enable_buffering(STREAM_BUFFER)
+    return stream
+
+
+def timed(chunks):
+    started = time.perf_counter()
+    first = None
+    size = 0
+    for chunk in chunks:
+        if first is None:
+            first = time.perf_counter() - started
+        size += len(chunk)
+    return time.perf_counter() - started, first, size
+
+
+def run(row_counts):
+    env = make_env()
+    print(f"{'rows':>6} {'legacy ms/1k':>12} {'ttfb':>8} {'stream ms/1k':>12} {'ttfb':>8}")
+    for count in row_counts:
+        rows = [(f"Imię{i}", f"Nazwisko{i}", 480.0 + i % 60) for i in range(count)]
+        legacy, legacy_first, _ = timed(legacy_render(rows))
+        streamed, streamed_first, _ = timed(streamed_render(env, rows))
+        per_k = 1000 * 1000 / count
+        print(f"{count:6d} {legacy * per_k:12.2f} {legacy_first * 1000:6.1f}ms "
+              f"{streamed * per_k:12.2f} {streamed_first * 1000:6.1f}ms")
+
+
+if __name__ == '__main__':
+    run([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000])
@@ -0,0 +1,45 @@
+"""Compare per-row insert_event with batched insert_events.
+
+Usage: python -m benchmarks.bench_ingest [rows]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from loguru import logger
+
+from app import database, events
+from benchmarks.synthetic import write_events_csv
+
+
+def run(rows):
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        csv_path = write_events_csv(os.path.join(tmp, 'PREvents.csv'), rows)
+        event_list = events.read_events(csv_path, [1, 2, 7])
+
+        database.configure(os.path.join(tmp, 'single.db'))
+        database.init_db()
+        started = time.perf_counter()
+        for event in event_list:
+            database.insert_event(event)
+        single = time.perf_counter() - started
+
+        database.configure(os.path.join(tmp, 'bulk.db'))
+        database.init_db()
+        started = time.perf_counter()
+        database.insert_events(event_list)
+        bulk = time.perf_counter() - started
+
+        print(f"rows={len(event_list)}")
+        print(f"insert_event:  {single:8.2f}s  {len(event_list) / single:10.0f} rows/s")
+        print(f"insert_events: {bulk:8.2f}s  {len(event_list) / bulk:10.0f} rows/s")
+        database.close_connection()
+        os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    logger.remove()
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,47 @@
+"""Peak memory of parsed events: legacy EventProcessor objects vs Event records.
+
+Usage: python -m benchmarks.bench_memory [rows]
+"""
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from loguru import logger
+
+from app import events
+from benchmarks.synthetic import write_events_csv
+
+
+def legacy_parse(csv_path):
+    """Per-row EventProcessor objects with their own strings, as before Event"""
+    result = []
+    with open(csv_path, encoding='cp1250') as f:
+        for line in f:
+            if line.startswith('#'):
+                continue
+            time_str, day, name, surname, id_point = line.strip().split(';')[:5]
+            result.append(events.EventProcessor(time_str, day, name, surname, int(id_point)))
+    return result
+
+
+def measure(label, func):
+    tracemalloc.start()
+    parsed = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_100k = peak / len(parsed) * 100_000
+    print(f"{label:16} {len(parsed):8d} events  peak {peak / 2**20:7.1f} MiB  ({per_100k / 2**20:5.1f} MiB per 100k)")
+    return parsed
+
+
+def run(rows):
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = write_events_csv(os.path.join(tmp, 'PREvents.csv'), rows, id_points=(1, 2))
+        measure('EventProcessor', lambda: legacy_parse(csv_path))
+        measure('Event', lambda: events.read_events(csv_path, [1, 2]))
+
+
+if __name__ == '__main__':
+    logger.remove()
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
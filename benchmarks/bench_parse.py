@@ -0,0 +1,37 @@
+"""Parse speed and peak memory of read_events vs streaming iter_events.
+
+Usage: python -m benchmarks.bench_parse [rows]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from loguru import logger
+
+from app import events
+from benchmarks.synthetic import write_events_csv
+
+
+def measure(label, func):
+    tracemalloc.start()
+    started = time.perf_counter()
+    count = func()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:12} {count:8d} events  {elapsed:6.2f}s  peak {peak / 2**20:8.1f} MiB")
+
+
+def run(rows):
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = write_events_csv(os.path.join(tmp, 'PREvents.csv'), rows)
+        print(f"file size {os.path.getsize(csv_path) / 2**20:.1f} MiB")
+        measure('read_events', lambda: len(events.read_events(csv_path, [1, 2])))
+        measure('iter_events', lambda: sum(1 for _ in events.iter_events(csv_path, [1, 2])))
+
+
+if __name__ == '__main__':
+    logger.remove()
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,59 @@
+"""PDF render time vs row count: per-call styles + Table vs shared styles + LongTable.
+
+Usage: python -m benchmarks.bench_pdf [rows ...]
+"""
+import io
+import sys
+import time
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from app import pdf
+
+
+def legacy_render(title, time_spent):
+    """The render path used before styles were shared and LongTable was adopted"""
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    title_style = ParagraphStyle('CustomTitle', parent=getSampleStyleSheet()['Title'], fontName=pdf.FONT_BOLD, fontSize=18)
+    data = [['Imię', 'Nazwisko', 'Spędzony czas']]
+    for name, surname, mins in time_spent:
+        data.append([name, surname, f"{int(mins // 60)} godziny {int(mins % 60)} minut"])
+    table = Table(data)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), pdf.FONT_BOLD),
+        ('FONTSIZE', (0, 0), (-1, 0), 14),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('FONTNAME', (0, 1), (-1, -1), pdf.FONT_NAME),
+        ('FONTSIZE', (0, 1), (-1, -1), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    doc.build([Paragraph(title, title_style), Spacer(1, 0.5*inch), table])
+    return buffer
+
+
+def timed(func):
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def run(row_counts):
+    print(f"{'rows':>6} {'legacy':>9} {'current':>9}")
+    for rows in row_counts:
+        time_spent = [(f"Imię{i}", f"Nazwisko{i}", 480.0 + i % 60) for i in range(rows)]
+        legacy = timed(lambda: legacy_render("Raport", time_spent))
+        current = timed(lambda: pdf.render_report("Raport", time_spent))
+        print(f"{rows:6d} {legacy:8.2f}s {current:8.2f}s")
+
+
+if __name__ == '__main__':
+    run([int(arg) for arg in sys.argv[1:]] or [100, 500, 2000, 5000])
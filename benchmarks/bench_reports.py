@@ -0,0 +1,74 @@
+"""Report query latency on a large synthetic events.db, before and after the report indexes.
+
+Usage: python -m benchmarks.bench_reports [rows]
+
+"before" drops every index, as databases created before schema migrations
+had none; "after" recreates the indexes of the current schema. Reports are
+computed with the database._compute_* functions, bypassing the report cache.
+The day and month span reports read the daily_attendance summary, whose
+primary key is kept, so the index effect shows in the events-table queries
+(presence and monthly sessions).
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from loguru import logger
+
+from app import database
+from benchmarks.synthetic import generate_rows
+
+IN_IDS = [1]
+OUT_IDS = [2]
+
+
+def timed(label, func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"  {label:28} {best * 1000:9.1f} ms")
+
+
+def run_reports():
+    start, end = database._month_range(2024, 6)
+    timed('daily time spent', lambda: database._compute_time_spent('2024-06-12', IN_IDS, OUT_IDS))
+    timed('get_users_on_site', lambda: database.get_users_on_site(IN_IDS, OUT_IDS, '2024-06-12'))
+    timed('monthly time spent', lambda: database._compute_monthly_time_spent(2024, 6, IN_IDS, OUT_IDS), repeat=1)
+    timed('monthly sessions', lambda: database._compute_monthly_sessions(start, end, 16 * 3600, IN_IDS, OUT_IDS), repeat=1)
+
+
+def run(rows):
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        database.configure(os.path.join(tmp, 'events.db'))
+        database.init_db()
+        started = time.perf_counter()
+        database.insert_events(generate_rows(rows, days=730), batch_size=50_000)
+        print(f"built {rows} rows in {time.perf_counter() - started:.0f}s")
+
+        conn = sqlite3.connect('events.db')
+        indexes = [name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'")]
+        for name in indexes:
+            conn.execute(f'DROP INDEX {name}')
+        conn.commit()
+        print("before (no indexes):")
+        run_reports()
+
+        database._create_event_indexes(conn.cursor())
+        conn.commit()
+        print("after (schema indexes):")
+        run_reports()
+        conn.close()
+        database.close_connection()
+        os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    logger.remove()
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000)
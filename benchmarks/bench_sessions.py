@@ -0,0 +1,58 @@
+"""Per-day totals for a month: one session sweep vs a day report query per day.
+
+Usage: python -m benchmarks.bench_sessions [people] [events_per_day]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from loguru import logger
+
+from app import database
+from benchmarks.synthetic import generate_rows
+
+IN_IDS = [1]
+OUT_IDS = [2]
+
+
+def per_day_queries(year, month):
+    """Daily breakdown the only way available before: one _compute_time_spent per day"""
+    day = date(year, month, 1)
+    daily = {}
+    while day.month == month:
+        for name, surname, mins in database._compute_time_spent(day.isoformat(), IN_IDS, OUT_IDS):
+            daily.setdefault((name, surname), []).append((day.isoformat(), mins))
+        day += timedelta(days=1)
+    return daily
+
+
+def run(people, events_per_day):
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        database.configure(os.path.join(tmp, 'events.db'))
+        database.init_db()
+        rows = people * 31 * events_per_day
+        database.insert_events(generate_rows(rows, persons=people, id_points=(1, 2), days=31), batch_size=50_000)
+        print(f"{rows} events for {people} people in 2024-01")
+        start, end = database._month_range(2024, 1)
+
+        started = time.perf_counter()
+        per_day_queries(2024, 1)
+        queries = time.perf_counter() - started
+        started = time.perf_counter()
+        sessions = database._compute_monthly_sessions(start, end, 16 * 3600, IN_IDS, OUT_IDS)
+        sweep = time.perf_counter() - started
+        print(f"31 day queries  {queries * 1000:8.1f} ms")
+        print(f"session sweep   {sweep * 1000:8.1f} ms  {len(sessions)} people, "
+              f"{sum(len(daily) for *_, daily in sessions)} person-days")
+        database.close_connection()
+        os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    logger.remove()
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 4)
@@ -0,0 +1,70 @@
+"""Bytes fetched from the share per ingest cycle: parse + re-read on archive vs spool once.
+
+Runs against benchmarks.fake_share, a local folder standing in for
+\\\\server\\share, and also counts client configurations and sessions.
+
+Usage: python -m benchmarks.bench_smb_cycle [rows] [cycles]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+from loguru import logger
+
+from app import database, events, files, ingest, smb
+from benchmarks import fake_share
+from benchmarks.synthetic import write_events_csv
+
+REMOTE = '\\\\server\\share\\PREvents.csv'
+EVENT_IDS = [1, 2, 7]
+
+
+def legacy_cycle(share_module, archive):
+    """What a cycle did before spooling: parse from the share, then read it again to archive"""
+    share_module.ClientConfig(username=None, password=None)
+    database.insert_events(events.iter_events(REMOTE, EVENT_IDS))
+    share_module.ClientConfig(username=None, password=None)
+    with events.EventProcessor._open_text(REMOTE) as f:
+        content = f.read()
+    with open(os.path.join(archive, f"PREvents.csv.{time.time_ns()}"), 'w', encoding='utf-8') as f:
+        f.write(content)
+    share_module.ClientConfig(username=None, password=None)
+    share_module.remove(smb.to_url(REMOTE))
+
+
+def run(rows, cycles):
+    logger.remove()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        with open('config.json', 'w') as f:
+            json.dump({'spool_folder': 'spool'}, f)
+        share = fake_share.install(os.path.join(tmp, 'share'))
+        remote_file = share.local_path(smb.to_url(REMOTE))
+        os.makedirs(os.path.dirname(remote_file))
+        database.configure(os.path.join(tmp, 'events.db'))
+        database.init_db()
+        files.ensure_archive_folder('archive')
+
+        print(f"{'pipeline':>8} {'MB/cycle':>9} {'file MB':>8} {'configs':>8} {'sessions':>8}")
+        for name in ('legacy', 'spool'):
+            share.bytes_read = share.configs = share.sessions = 0
+            smb.reset()
+            smb._configured = False
+            for cycle in range(cycles):
+                write_events_csv(remote_file, rows, seed=cycle)
+                size = os.path.getsize(remote_file)
+                if name == 'legacy':
+                    legacy_cycle(sys.modules['smbclient'], 'archive')
+                else:
+                    ingest.process_file(REMOTE, 'archive', EVENT_IDS)
+            print(f"{name:>8} {share.bytes_read / cycles / 1e6:9.2f} {size / 1e6:8.2f} "
+                  f"{share.configs:8d} {share.sessions:8d}")
+        database.close_connection()
+        os.chdir(os.path.dirname(tmp))
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    run(args[0] if args else 200000, args[1] if len(args) > 1 else 5)
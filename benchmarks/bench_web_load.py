@@ -0,0 +1,40 @@
+"""Requests/sec against a running web server with N concurrent clients.
+
+Start the server first (python -m app.web for the development server,
+python -m app.serve for waitress), then:
+
+Usage: python -m benchmarks.bench_web_load [url] [requests] [concurrency ...]
+"""
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def fetch(url):
+    with urllib.request.urlopen(url, timeout=30) as response:
+        response.read()
+        return response.status
+
+
+def run(url, requests, concurrencies):
+    print(f"{'clients':>7} {'seconds':>8} {'req/s':>8} {'errors':>6}")
+    for clients in concurrencies:
+        errors = 0
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            futures = [pool.submit(fetch, url) for _ in range(requests)]
+            for future in futures:
+                try:
+                    future.result()
+                except Exception:
+                    errors += 1
+        elapsed = time.perf_counter() - started
+        print(f"{clients:7d} {elapsed:8.2f} {requests / elapsed:8.1f} {errors:6d}")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    url = args[0] if args else "http://127.0.0.1:5000/users_on_site"
+    requests = int(args[1]) if len(args) > 1 else 500
+    run(url, requests, [int(arg) for arg in args[2:]] or [1, 4, 16, 32])
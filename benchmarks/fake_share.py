@@ -0,0 +1,78 @@
+"""A local stand-in for smbclient, serving \\\\server\\share\\... from a folder.
+
+install(root) puts it in sys.modules['smbclient'] so app.smb uses it; the
+returned object counts bytes read, sessions opened and client configurations.
+"""
+import os
+import sys
+import types
+
+
+class FakeShare:
+    def __init__(self, root):
+        self.root = root
+        self.bytes_read = 0
+        self.sessions = 0
+        self.configs = 0
+
+    def local_path(self, url):
+        return os.path.join(self.root, *url.replace('\\', '/').strip('/').split('/'))
+
+    def module(self):
+        share = self
+
+        class CountingFile:
+            def __init__(self, f):
+                self._f = f
+
+            def read(self, size=-1):
+                data = self._f.read(size)
+                share.bytes_read += len(data)
+                return data
+
+            def readinto(self, buffer):
+                n = self._f.readinto(buffer)
+                share.bytes_read += n or 0
+                return n
+
+            def __getattr__(self, name):
+                return getattr(self._f, name)
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                self._f.close()
+
+        def client_config(**kwargs):
+            share.configs += 1
+
+        def register_session(server, **kwargs):
+            share.sessions += 1
+
+        def open_file(url, mode='r', encoding=None, **kwargs):
+            if 'b' in mode:
+                return CountingFile(open(share.local_path(url), mode))
+            # Text mode: count the raw bytes, decode like smbclient does
+            with open(share.local_path(url), 'rb') as f:
+                data = f.read()
+            share.bytes_read += len(data)
+            import io
+            return io.StringIO(data.decode(encoding))
+
+        module = types.ModuleType('smbclient')
+        module.ClientConfig = client_config
+        module.register_session = register_session
+        module.reset_connection_cache = lambda **kwargs: None
+        module.open_file = open_file
+        module.stat = lambda url: os.stat(share.local_path(url))
+        module.remove = lambda url: os.remove(share.local_path(url))
+        module.rename = lambda src, dst: os.rename(share.local_path(src), share.local_path(dst))
+        module.listdir = lambda url: os.listdir(share.local_path(url))
+        return module
+
+
+def install(root):
+    share = FakeShare(root)
+    sys.modules['smbclient'] = share.module()
+    return share
@@ -0,0 +1,32 @@
+"""Synthetic PREvents.csv data for the benchmarks in this folder."""
+import random
+from datetime import date, timedelta
+
+NAMES = ['Jan', 'Anna', 'Piotr', 'Katarzyna', 'Paweł', 'Małgorzata', 'Łukasz', 'Zofia']
+SURNAMES = ['Kowalski', 'Nowak', 'Wiśniewski', 'Wójcik', 'Kamińska', 'Lewandowski', 'Żak', 'Dąbrowska']
+
+
+def people(count):
+    """Return count distinct (name, surname) pairs."""
+    return [(NAMES[i % len(NAMES)], f"{SURNAMES[i % len(SURNAMES)]}{i}") for i in range(count)]
+
+
+def generate_rows(rows, persons=2000, start=date(2024, 1, 1), id_points=(1, 2, 7), seed=42, days=30):
+    """Yield (time, date, name, surname, id_point) tuples in file order, spread over days."""
+    rnd = random.Random(seed)
+    staff = people(persons)
+    for i in range(rows):
+        day = start + timedelta(days=i * days // max(rows, 1))
+        name, surname = staff[rnd.randrange(persons)]
+        seconds = rnd.randrange(6 * 3600, 20 * 3600)
+        time_str = f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+        yield time_str, day.isoformat(), name, surname, rnd.choice(id_points)
+
+
+def write_events_csv(path, rows, encoding='cp1250', **kwargs):
+    """Write a PREvents.csv-style file with rows data lines and return its path."""
+    with open(path, 'w', encoding=encoding, newline='') as f:
+        f.write("# PREvents export\r\n")
+        for time_str, day, name, surname, id_point in generate_rows(rows, **kwargs):
+            f.write(f"{time_str};{day};{name};{surname};{id_point};\r\n")
+    return path
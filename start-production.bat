@@ -25,7 +25,7 @@ if errorlevel 1 (
 
 REM Start the web server in background
 echo Starting web server...
-start /B "MINI RCP Web Server" python -m app.web
+start /B "MINI RCP Web Server" python -m app.serve
 
 REM Start the processor in background
 echo Starting processor...
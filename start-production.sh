@@ -24,7 +24,7 @@ start_service() {
 }
 
 # Start the web server
-start_service "web-server" "python -m app.web" "logs/web.log"
+start_service "web-server" "python -m app.serve" "logs/web.log"
 
 # Start the processor
 start_service "processor" "python -m app.processor" "logs/processor.log"